@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the packet 1 and cell voltage decoders.
+
+Compares the struct/array based decoders with the previous implementation,
+which converted every value with a separate buf2int16SI/buf2int16US call.
+
+    $ python benchmarks/bench_decode.py
+"""
+import os
+import sys
+import timeit
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bydhvs import BYDHVS, build_frame  # noqa: E402
+
+
+def legacy_parse_packet1(batt: BYDHVS, data: bytes) -> None:
+    """Decode packet 1 value by value like the previous implementation."""
+    batt.hvsSOC = batt.buf2int16SI(data, 3)
+    batt.hvsMaxVolt = round(batt.buf2int16SI(data, 5) * 1.0 / 100.0, 2)
+    batt.hvsMinVolt = round(batt.buf2int16SI(data, 7) * 1.0 / 100.0, 2)
+    batt.hvsSOH = batt.buf2int16SI(data, 9)
+    batt.hvsA = round(batt.buf2int16SI(data, 11) * 1.0 / 10.0, 1)
+    batt.hvsBattVolt = round(batt.buf2int16US(data, 13) * 1.0 / 100.0, 1)
+    batt.hvsMaxTemp = batt.buf2int16SI(data, 15)
+    batt.hvsMinTemp = batt.buf2int16SI(data, 17)
+    batt.hvsBatTemp = batt.buf2int16SI(data, 19)
+    batt.hvsError = batt.buf2int16SI(data, 29)
+    batt.hvsParamT = str(data[31]) + "." + str(data[32])
+    batt.hvsOutVolt = round(batt.buf2int16US(data, 35) * 1.0 / 100.0, 1)
+    batt.hvsPower = round(batt.hvsA * batt.hvsOutVolt, 2)
+    batt.hvsDiffVolt = round(batt.hvsMaxVolt - batt.hvsMinVolt, 2)
+    error_string = ""
+    for j in range(16):
+        if ((1 << j) & batt.hvsError) != 0:
+            if len(error_string) > 0:
+                error_string += "; "
+            error_string += batt.myErrors[j]
+    batt.hvsErrorString = error_string or "No Error"
+    batt.hvsChargeTotal = batt.buf2int32US(data, 37) / 10
+    batt.hvsDischargeTotal = batt.buf2int32US(data, 41) / 10
+
+
+def legacy_parse_packet6(batt: BYDHVS, data: bytes) -> None:
+    """Decode a cell voltage block value by value."""
+    for i in range(min(batt.hvsNumCells - 16, 64)):
+        batt.cellVoltages.append(batt.buf2int16SI(data, 5 + i * 2))
+
+
+def make_frame(values) -> bytes:
+    """Build a CRC-valid read response carrying the given 16-bit words."""
+    payload = b"".join(value.to_bytes(2, "big", signed=True) for value in values)
+    return build_frame(bytes((1, 3, len(payload))) + payload)
+
+
+def bench(label: str, func, number: int) -> float:
+    """Time func and print nanoseconds per call."""
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    ns = best / number * 1e9
+    print(f"{label:<28} {ns:10.0f} ns/frame")
+    return ns
+
+
+def main() -> None:
+    """Run the decoder benchmarks."""
+    number = 20000
+    batt = BYDHVS("127.0.0.1")
+    batt.hvsNumCells = 160
+    batt.hvsNumTemps = 64
+    packet1 = make_frame(
+        [80, 350, 330, 99, -52, 40500 - 65536, 25, 20, 22]
+        + [0] * 4
+        + [0, 0x0501, 0, 40400 - 65536, 1234, 1, 1000, 1]
+        + [0] * 4
+    )
+    packet6 = make_frame([3300 + i for i in range(65)])
+
+    def legacy6():
+        batt.cellVoltages = []
+        legacy_parse_packet6(batt, packet6)
+
+    def struct6():
+        batt.cellVoltages = array("h")
+        batt.parse_packet6(packet6)
+
+    def legacy1():
+        legacy_parse_packet1(batt, packet1)
+
+    def struct1():
+        batt.parse_packet1(packet1)
+
+    old = bench("packet 1 (per field)", legacy1, number)
+    new = bench("packet 1 (struct)", struct1, number)
+    print(f"{'':<28} {old / new:10.1f} x faster")
+    old = bench("cell block (per value)", legacy6, number)
+    new = bench("cell block (array)", struct6, number)
+    print(f"{'':<28} {old / new:10.1f} x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Benchmark suite of the BYD HVS hot path.
+
+Measures frame validation and decoding per packet type, snapshot building,
+complete polls against the local simulator and the memory used per device
+instance. Frames are produced by bydhvs.simulator, so they carry the same
+layout as those of a real b-Box.
+
+    $ python benchmarks/run.py
+    $ python benchmarks/run.py --quick --concurrency 1 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bydhvs  # noqa: E402
+from bydhvs import BYDHVS, crc16_modbus  # noqa: E402
+from bydhvs.simulator import BYDSimulator, start_simulators  # noqa: E402
+
+# Request index -> name of the frame it returns, in the order of a poll of
+# a 5 module HVS (160 cells, two passes)
+_FRAME_SEQUENCE = (
+    (0, "packet0"),
+    (1, "packet1"),
+    (2, "packet2"),
+    (3, None),
+    (5, "packet5"),
+    (6, "packet6"),
+    (7, "packet7"),
+    (8, "packet8"),
+    (9, None),
+    (10, None),
+    (12, "packet12"),
+    (13, "packet13"),
+)
+
+
+def capture_frames() -> dict:
+    """Return realistic response frames by name."""
+    simulator = BYDSimulator("HVS", modules=5, measurement_delay=0.0, seed=1)
+    frames = {}
+    for index, name in _FRAME_SEQUENCE:
+        response = simulator.handle_request(BYDHVS.myRequests[index])
+        if name is not None:
+            frames[name] = response
+    return frames
+
+
+def bench(label: str, func, number: int, unit: str = "frame") -> float:
+    """Time func and print nanoseconds per call."""
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    ns = best / number * 1e9
+    print(f"  {label:<30} {ns:12.0f} ns/{unit}")
+    return ns
+
+
+def bench_decoding(number: int) -> None:
+    """Benchmark CRC, frame validation and the parse methods."""
+    frames = capture_frames()
+    batt = BYDHVS("127.0.0.1")
+    for name in ("packet0", "packet1", "packet2", "packet5", "packet6",
+                 "packet7", "packet8", "packet12", "packet13"):
+        getattr(batt, "parse_" + name)(frames[name])
+
+    print("Frame handling")
+    block = frames["packet6"]
+    bench("crc16_modbus (135 bytes)", lambda: crc16_modbus(block), number)
+    bench("check_packet (135 bytes)", lambda: batt.check_packet(block), number)
+    summary = frames["packet1"]
+    bench("check_packet (55 bytes)", lambda: batt.check_packet(summary), number)
+
+    print("Decoding")
+    for name in ("packet0", "packet1", "packet2", "packet5"):
+        parser = getattr(batt, "parse_" + name)
+        frame = frames[name]
+        bench("parse_" + name, lambda: parser(frame), number)
+
+    # The remaining parsers append to the cell arrays of the previous ones
+    def parse_after(parser, frame, cells: int, temps: int):
+        def run():
+            del batt.cellVoltages[cells:]
+            del batt.cellBalancing[min(cells, 128):]
+            del batt.cellTemperatures[temps:]
+            batt.balancingStatus = batt.balancingStatus[:32]
+            parser(frame)
+
+        return run
+
+    for name, cells, temps in (
+        ("packet6", 16, 0),
+        ("packet7", 80, 0),
+        ("packet8", 128, 30),
+        ("packet12", 128, 60),
+        ("packet13", 144, 60),
+    ):
+        parser = getattr(batt, "parse_" + name)
+        bench("parse_" + name, parse_after(parser, frames[name], cells, temps),
+              number)
+
+    print("Results")
+    bench("snapshot", batt.snapshot, number, "call")
+    bench("get_data", batt.get_data, number, "call")
+
+
+async def bench_polls(polls: int, concurrency_levels) -> None:
+    """Benchmark complete polls against simulators."""
+    print("Polling (5 module HVS, measurement delay 0)")
+    async with BYDSimulator("HVS", modules=5, measurement_delay=0.0) as simulator:
+        batt = BYDHVS(
+            "127.0.0.1", simulator.port, persistent=True, adaptive_measurement=True
+        )
+        await batt.poll()
+        start = time.perf_counter()
+        for _ in range(polls):
+            await batt.poll()
+        elapsed = time.perf_counter() - start
+        await batt.close()
+        print(f"  {'poll (persistent)':<30} {elapsed / polls * 1e3:12.2f} ms/poll")
+
+        batt = BYDHVS("127.0.0.1", simulator.port)
+        start = time.perf_counter()
+        for _ in range(polls):
+            await batt.poll_summary()
+        elapsed = time.perf_counter() - start
+        print(f"  {'poll_summary (reconnecting)':<30} "
+              f"{elapsed / polls * 1e3:12.2f} ms/poll")
+
+    for concurrency in concurrency_levels:
+        # One simulator per client, as every b-Box has its own block stream
+        simulators = await start_simulators(
+            concurrency, battery_type="HVS", modules=5, measurement_delay=0.0
+        )
+        devices = [
+            BYDHVS(
+                "127.0.0.1", simulator.port, persistent=True,
+                adaptive_measurement=True,
+            )
+            for simulator in simulators
+        ]
+        await asyncio.gather(*(device.poll() for device in devices))
+        rounds = max(1, polls // concurrency)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(device.poll() for device in devices))
+        elapsed = time.perf_counter() - start
+        for device in devices:
+            await device.close()
+        for simulator in simulators:
+            await simulator.stop()
+        rate = rounds * concurrency / elapsed
+        print(f"  {f'concurrency {concurrency}':<30} {rate:12.1f} polls/s")
+
+
+async def bench_memory(instances: int) -> None:
+    """Measure the memory retained by polled device instances."""
+    print(f"Memory ({instances} polled instances of a 5 module HVS)")
+    simulators = await start_simulators(
+        instances, battery_type="HVS", modules=5, measurement_delay=0.0
+    )
+    tracemalloc.start()
+    devices = [
+        BYDHVS("127.0.0.1", simulator.port, adaptive_measurement=True)
+        for simulator in simulators
+    ]
+    await asyncio.gather(*(device.poll() for device in devices))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for simulator in simulators:
+        await simulator.stop()
+    print(f"  {'retained':<30} {current / instances:12.0f} B/instance")
+    # The peak includes the transient buffers of the simulators
+    print(f"  {'peak during poll':<30} {peak / instances:12.0f} B/instance")
+
+
+def main() -> None:
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer iterations, for a fast sanity check")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 10, 50, 100],
+                        help="concurrency levels of the throughput test")
+    parser.add_argument("--instances", type=int, default=100,
+                        help="device instances of the memory test")
+    args = parser.parse_args()
+
+    # Probe the measurement status immediately, the simulator answers at once.
+    # The polls use adaptive_measurement, the fixed delay would dominate.
+    bydhvs._MEASUREMENT_FIRST_PROBE = 0.0
+    bydhvs._MEASUREMENT_MIN_PROBE = 0.0
+
+    print(f"Python {sys.version.split()[0]}")
+    bench_decoding(2000 if args.quick else 20000)
+    asyncio.run(bench_polls(20 if args.quick else 200, args.concurrency))
+    asyncio.run(bench_memory(args.instances))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,17 @@ data for use in Home Assistant.
 """
 
 import asyncio
+import contextvars
 import logging
+import struct
+import sys
+import time
+from array import array
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -22,16 +32,645 @@ class BYDHVSConnectionError(BYDHVSError):
 class BYDHVSTimeoutError(BYDHVSError):
     """Exception raised when a timeout occurs during communication."""
 
+    def __init__(self, message: str, state: Optional[int] = None) -> None:
+        """Initialize the exception with the state it occurred in."""
+        super().__init__(message)
+        self.state = state
+
+
+def _make_crc16_table() -> tuple:
+    """Precompute the CRC16 (Modbus, polynomial 0xA001) lookup table."""
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC16_TABLE = _make_crc16_table()
+
+
+def crc16_modbus(data) -> int:
+    """Calculate the Modbus CRC16 of the given data.
+
+    Accepts bytes, bytearray or memoryview, so slices of a larger buffer can
+    be checked without copying them. Running the CRC over a frame including
+    its trailing CRC yields 0 for a valid frame.
+    """
+    crc = 0xFFFF
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def build_frame(payload: bytes) -> bytes:
+    """Append the Modbus CRC16 (low byte first) to a frame payload."""
+    return bytes(payload) + crc16_modbus(payload).to_bytes(2, "little")
+
+
+def read_registers_request(address: int, count: int, unit_id: int = 1) -> bytes:
+    """Build a "read holding registers" (function 3) request frame."""
+    return build_frame(struct.pack(">BBHH", unit_id, 3, address, count))
+
+
+def write_registers_request(address: int, values, unit_id: int = 1) -> bytes:
+    """Build a "write multiple registers" (function 16) request frame."""
+    count = len(values)
+    return build_frame(
+        struct.pack(
+            f">BBHHB{count}H", unit_id, 16, address, count, count * 2, *values
+        )
+    )
+
+
+# Request frames, indexed by request number
+REQUESTS = (
+    read_registers_request(0x0000, 0x66),  # 0
+    read_registers_request(0x0500, 0x19),  # 1
+    read_registers_request(0x0010, 0x03),  # 2
+    write_registers_request(0x0550, (0x0001, 0x8100)),  # 3 Start measurement
+    read_registers_request(0x0551, 0x01),  # 4
+    read_registers_request(0x0558, 0x41),  # 5
+    read_registers_request(0x0558, 0x41),  # 6
+    read_registers_request(0x0558, 0x41),  # 7
+    read_registers_request(0x0558, 0x41),  # 8
+    # Switching for more than 4 modules
+    write_registers_request(
+        0x0100, (0x4445, 0x4255, 0x4700)
+    ),  # 9 Switch to second pass ("DEBUG")
+    write_registers_request(
+        0x0550, (0x0001, 0x8100)
+    ),  # 10 Start measurement of remaining cells
+    read_registers_request(0x0551, 0x01),  # 11
+    read_registers_request(0x0558, 0x41),  # 12
+    read_registers_request(0x0558, 0x41),  # 13
+    read_registers_request(0x0558, 0x41),  # 14
+    read_registers_request(0x0558, 0x41),  # 15
+    write_registers_request(0x0550, (0x0002, 0x8100)),  # 16 - Switch to Box 2
+)
+
+# Texts of the error bits in packet 1
+ERRORS = (
+    "High temperature during charging (cells)",
+    "Low temperature during charging (cells)",
+    "Overcurrent during discharging",
+    "Overcurrent during charging",
+    "Main circuit failure",
+    "Short circuit alarm",
+    "Cell imbalance",
+    "Current sensor error",
+    "Battery overvoltage",
+    "Battery undervoltage",
+    "Cell overvoltage",
+    "Cell undervoltage",
+    "Voltage sensor error",
+    "Temperature sensor error",
+    "High temperature during discharging (cells)",
+    "Low temperature during discharging (cells)",
+)
+
+# Inverter types in packet 2
+INVERTERS = (
+    "Fronius HV",  # 0
+    "Goodwe HV",  # 1
+    "Fronius HV",  # 2
+    "Kostal HV",  # 3
+    "Goodwe HV",  # 4
+    "SMA SBS3.7/5.0",  # 5
+    "Kostal HV",  # 6
+    "SMA SBS3.7/5.0",  # 7
+    "Sungrow HV",  # 8
+    "Sungrow HV",  # 9
+    "Kaco HV",  # 10
+    "Kaco HV",  # 11
+    "Ingeteam HV",  # 12
+    "Ingeteam HV",  # 13
+    "SMA SBS 2.5 HV",  # 14
+    "undefined",  # 15
+    "SMA SBS 2.5 HV",  # 16
+    "Fronius HV",  # 17
+    "undefined",  # 18
+    "SMA STP",  # 19
+)
+
+# Overflow policies of BYDHVS.stream()
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+
+
+async def _enqueue(queue: asyncio.Queue, item, overflow: str) -> None:
+    """Put item into a bounded queue, applying an overflow policy.
+
+    OVERFLOW_BLOCK waits for a free slot, OVERFLOW_DROP_OLDEST makes room by
+    discarding the oldest item.
+    """
+    if overflow == OVERFLOW_BLOCK:
+        await queue.put(item)
+        return
+    if queue.full():
+        queue.get_nowait()
+        _LOGGER.debug("Consumer too slow, dropped the oldest item")
+    queue.put_nowait(item)
+
+
+# Deadline (time.monotonic()) of the poll running in the current task
+_POLL_DEADLINE = contextvars.ContextVar("bydhvs_poll_deadline", default=None)
+# Retries left for the poll running in the current task
+_RETRY_BUDGET = contextvars.ContextVar("bydhvs_retry_budget", default=None)
+# Assumed duration (seconds) of a round trip before one was measured
+_DEFAULT_ROUND_TRIP = 0.5
+
+# Busy flag in the measurement status register (0x0551)
+_MEASUREMENT_BUSY = 0x8000
+# Probe intervals (seconds) while waiting for a cell measurement
+_MEASUREMENT_FIRST_PROBE = 2.0
+_MEASUREMENT_MIN_PROBE = 0.25
+_MEASUREMENT_MAX_PROBE = 2.0
+
+
+# Layout of packet 1 as (field, byte offset, struct format code), compiled
+# into a single struct.Struct below. The 32-bit energy counters are sent
+# low word first, so they are split into two 16-bit words.
+_PACKET1_LAYOUT = (
+    ("soc", 3, "h"),
+    ("max_voltage", 5, "h"),
+    ("min_voltage", 7, "h"),
+    ("soh", 9, "h"),
+    ("current", 11, "h"),
+    ("battery_voltage", 13, "H"),
+    ("max_temperature", 15, "h"),
+    ("min_temperature", 17, "h"),
+    ("battery_temperature", 19, "h"),
+    ("error", 29, "h"),
+    ("param_table_major", 31, "B"),
+    ("param_table_minor", 32, "B"),
+    ("output_voltage", 35, "H"),
+    ("charge_total_low", 37, "H"),
+    ("charge_total_high", 39, "H"),
+    ("discharge_total_low", 41, "H"),
+    ("discharge_total_high", 43, "H"),
+)
+
+
+def compile_layout(layout) -> struct.Struct:
+    """Compile a (field, offset, format) layout into a big-endian Struct.
+
+    The fields must be sorted by offset; gaps are skipped with pad bytes.
+    """
+    fmt = ">"
+    pos = 0
+    for field, offset, code in layout:
+        if offset < pos:
+            raise ValueError(f"Field {field} overlaps the previous field")
+        fmt += f"{offset - pos}x" if offset > pos else ""
+        fmt += code
+        pos = offset + struct.calcsize(">" + code)
+    return struct.Struct(fmt)
+
+
+_PACKET1_STRUCT = compile_layout(_PACKET1_LAYOUT)
+_SWAP_INT16 = sys.byteorder == "little"
+
+
+def decode_int16_block(data, offset: int, count: int) -> array:
+    """Decode count big-endian signed 16-bit values starting at offset."""
+    values = array("h")
+    if count > 0:
+        values.frombytes(memoryview(data)[offset:offset + count * 2])
+        if _SWAP_INT16:
+            values.byteswap()
+    return values
+
+
+# Byte value -> its 8 bits as 0/1 bytes, least significant bit first
+_BITS = tuple(bytes((value >> bit) & 1 for bit in range(8)) for value in range(256))
+
+if hasattr(int, "bit_count"):
+
+    def popcount(value: int) -> int:
+        """Return the number of set bits of a non-negative integer."""
+        return value.bit_count()
+
+else:  # Python < 3.10
+
+    def popcount(value: int) -> int:
+        """Return the number of set bits of a non-negative integer."""
+        return bin(value).count("1")
+
+
+def decode_balancing_block(data, offset: int, count: int) -> array:
+    """Decode the balancing flags of count cells starting at offset.
+
+    The flags are 16-bit big-endian registers; bit n of register k belongs
+    to cell 16k + n + 1 of the measurement pass. Returns one 0/1 value per
+    cell.
+    """
+    flags = bytearray()
+    for pos in range(offset, offset + (count + 15) // 16 * 2, 2):
+        flags += _BITS[data[pos + 1]]
+        flags += _BITS[data[pos]]
+    return array("B", flags[:max(count, 0)])
+
+
+class PlanStep(NamedTuple):
+    """One round trip of the detailed query."""
+
+    state: int  # State number used in log messages
+    request: int  # Index into BYDHVS.myRequests
+    parser: Optional[str] = None  # Name of the BYDHVS parse method
+    wait: bool = False  # Poll the measurement status until ready
+    pass_start: bool = False  # First step of a measurement pass
+    tower: int = 1  # Tower measured by the step
+
+
+# Detailed query as (step, needed(cells, temps)). Requests 5-8 and 12-15 all
+# read register 0x0558, which returns the next block of the measurement on
+# every read, so a block can only be skipped if no later block of the same
+# pass is needed either. For the same reason a failed block read cannot
+# simply be repeated; the whole pass is repeated instead.
+_FIRST_PASS = (
+    (PlanStep(5, 3, pass_start=True), None),  # Start measurement
+    (PlanStep(6, 4, wait=True), None),
+    (PlanStep(7, 5, "parse_packet5"), None),  # Cells 1-16, balancing
+    (PlanStep(8, 6, "parse_packet6"), lambda cells, temps: cells > 16),
+    (PlanStep(9, 7, "parse_packet7"), lambda cells, temps: cells > 80 or temps > 0),
+    (PlanStep(10, 8, "parse_packet8"), lambda cells, temps: temps > 30),
+)
+_SECOND_PASS = (
+    (PlanStep(11, 9, pass_start=True), None),  # Switch to second pass
+    (PlanStep(12, 10), None),  # Start measurement of remaining cells
+    (PlanStep(13, 11, wait=True), None),
+    (PlanStep(14, 12, "parse_packet12"), None),  # Cells 129-144
+    (PlanStep(15, 13, "parse_packet13"), lambda cells, temps: cells > 144),
+)
+# Cells delivered by the first pass (packets 5, 6 and 7)
+_FIRST_PASS_CELLS = 16 + 64 + 48
+# Requests that start a measurement; they select the tower
+_START_MEASUREMENT = frozenset((3, 10))
+
+
+@lru_cache(maxsize=None)
+def start_measurement_request(tower: int) -> bytes:
+    """Return the request starting a cell measurement of a tower (1-based).
+
+    Towers 1 and 2 use the requests sent by BYD's tools. For tower 3 and
+    above the tower number is written to 0x0550 following the same pattern;
+    this frame has not been verified with a real installation of more than
+    two towers.
+    """
+    if tower == 1:
+        return REQUESTS[3]
+    if tower == 2:
+        return REQUESTS[16]
+    return write_registers_request(0x0550, (tower, 0x8100))
+
+
+def _compile_pass(steps, num_cells: int, num_temps: int) -> list:
+    """Drop the trailing blocks of a pass that carry nothing we use."""
+    plan = []
+    needed_later = False
+    for step, needed in reversed(steps):
+        if step.parser is not None and not needed_later:
+            if needed is not None and not needed(num_cells, num_temps):
+                continue
+            needed_later = True
+        plan.append(step)
+    plan.reverse()
+    return plan
+
+
+@lru_cache(maxsize=None)
+def compile_request_plan(num_cells: int, num_temps: int, towers: int = 1) -> tuple:
+    """Compile the detailed query for a topology into a tuple of PlanSteps.
+
+    The plan is empty for systems without cell details (e.g. LVS). The
+    second measurement pass is only included if there are more cells than
+    the first pass delivers. Towers are measured one after the other, as
+    every measurement start restarts the block stream of register 0x0558.
+    """
+    if num_cells <= 0 or num_temps <= 0:
+        return ()
+    plan = _compile_pass(_FIRST_PASS, num_cells, num_temps)
+    if num_cells > _FIRST_PASS_CELLS:
+        plan += _compile_pass(_SECOND_PASS, num_cells, num_temps)
+    return tuple(
+        step._replace(tower=tower) for tower in range(1, towers + 1) for step in plan
+    )
+
+
+class ModbusFrameReader:
+    """Read complete Modbus RTU frames from an asyncio stream.
+
+    The b-Box answers over a plain TCP stream, so a single read may return
+    part of a frame or several frames at once. The reader parses the frame
+    header to work out the expected length and reads exactly that many
+    bytes into a buffer that is allocated once and reused for every frame;
+    anything beyond the frame stays in the stream for the next call. Bytes
+    that cannot start a frame are discarded until the stream is in sync
+    again.
+    """
+
+    # Largest frame: 3 header bytes, 255 data bytes, 2 CRC bytes
+    MAX_FRAME = 3 + 255 + 2
+
+    def __init__(self, reader: asyncio.StreamReader, unit_id: int = 1) -> None:
+        """Initialize the frame reader on top of a stream reader."""
+        self.reader = reader
+        self.unit_id = unit_id
+        self._buffer = bytearray(self.MAX_FRAME)
+        self._view = memoryview(self._buffer)
+        self._size = 0  # Bytes of the buffer holding stream data
+
+    @staticmethod
+    def frame_length(header: bytes) -> Optional[int]:
+        """Return the total frame length announced by a 3 byte header.
+
+        Returns None if the header does not start a known frame.
+        """
+        function_code = header[1]
+        if function_code == 3:
+            return header[2] + 5  # 3 Header, 2 CRC
+        if function_code == 16:
+            return 8  # Address, function, register, count, CRC
+        if function_code in (0x83, 0x90):
+            return 5  # Exception response
+        return None
+
+    async def _fill(self, count: int) -> None:
+        """Read from the stream until the buffer holds count bytes."""
+        view = self._view
+        while self._size < count:
+            chunk = await self.reader.read(count - self._size)
+            if not chunk:
+                raise asyncio.IncompleteReadError(bytes(view[:self._size]), count)
+            view[self._size:self._size + len(chunk)] = chunk
+            self._size += len(chunk)
+
+    async def read_frame(self) -> bytes:
+        """Read the next frame from the stream.
+
+        Raises:
+            asyncio.IncompleteReadError: If the stream ends mid-frame.
+
+        """
+        buf = self._buffer
+        while True:
+            await self._fill(3)
+            length = None
+            if buf[0] == self.unit_id:
+                length = self.frame_length(buf)
+            if length is None:
+                start = buf.find(self.unit_id, 1, self._size)
+                dropped = self._size if start < 0 else start
+                _LOGGER.debug("Discarding %s: %s", dropped, buf[:dropped].hex())
+                buf[:self._size - dropped] = buf[dropped:self._size]
+                self._size -= dropped
+                continue
+            await self._fill(length)
+            self._size = 0
+            return bytes(self._view[:length])
+
+
+# Snapshot fields and the BYDHVS attributes they are taken from
+_SNAPSHOT_ATTRIBUTES = (
+    ("serial_number", "hvsSerial"),
+    ("bmu_firmware", "hvsBMU"),
+    ("bms_firmware", "hvsBMS"),
+    ("modules", "hvsModules"),
+    ("towers", "hvsTowers"),
+    ("grid_type", "hvsGrid"),
+    ("soc", "hvsSOC"),
+    ("max_voltage", "hvsMaxVolt"),
+    ("min_voltage", "hvsMinVolt"),
+    ("soh", "hvsSOH"),
+    ("current", "hvsA"),
+    ("battery_voltage", "hvsBattVolt"),
+    ("max_temperature", "hvsMaxTemp"),
+    ("min_temperature", "hvsMinTemp"),
+    ("battery_temperature", "hvsBatTemp"),
+    ("voltage_difference", "hvsDiffVolt"),
+    ("power", "hvsPower"),
+    ("error", "hvsErrorString"),
+    ("cell_voltages", "cellVoltages"),
+    ("cell_temperatures", "cellTemperatures"),
+    ("balancing_status", "balancingStatus"),
+    ("balancing_count", "balancingCount"),
+    ("cell_balancing", "cellBalancing"),
+    ("balancing_cells", "balancingCells"),
+    ("tower_data", "towerAttributes"),
+)
+
+
+# Fields of get_data() decoded from the summary (packet 1)
+_SUMMARY_FIELDS = frozenset((
+    "soc",
+    "max_voltage",
+    "min_voltage",
+    "soh",
+    "current",
+    "battery_voltage",
+    "max_temperature",
+    "min_temperature",
+    "battery_temperature",
+    "voltage_difference",
+    "power",
+    "error",
+))
+
+# (key, BYDHVS attribute) of the cell data kept per tower in towerAttributes
+_TOWER_ATTRIBUTES = (
+    ("cell_voltages", "cellVoltages"),
+    ("cell_temperatures", "cellTemperatures"),
+    ("cell_balancing", "cellBalancing"),
+    ("balancing_status", "balancingStatus"),
+    ("balancing_count", "balancingCount"),
+    ("max_cell_voltage", "maxCellVoltage_mV"),
+    ("min_cell_voltage", "minCellVoltage_mV"),
+    ("max_voltage_cell", "maxCellVoltageCell"),
+    ("min_voltage_cell", "minCellVoltageCell"),
+    ("max_temperature_cell", "maxCellTempCell"),
+    ("min_temperature_cell", "minCellTempCell"),
+)
+
+
+def _tower_data(towers) -> list:
+    """Return per-tower cell data with lists instead of arrays."""
+    return [
+        {
+            key: value.tolist() if isinstance(value, array) else value
+            for key, value in attributes.items()
+        }
+        for attributes in towers
+    ]
+
+
+class BYDHVSSnapshot:
+    """Immutable result of a polling cycle.
+
+    Cell voltages (mV) and temperatures are stored as compact typed arrays,
+    tower_data as read-only mappings shared with the polled instance. The
+    dictionary returned by as_dict() is only built when requested.
+    """
+
+    __slots__ = ("timestamp", "stale") + tuple(
+        field for field, _ in _SNAPSHOT_ATTRIBUTES
+    )
+
+    def __init__(self, timestamp: float, stale: bool = False, **fields) -> None:
+        """Initialize the snapshot from keyword arguments per field.
+
+        stale is True if the poll failed and the data is that of earlier
+        polls.
+        """
+        object.__setattr__(self, "timestamp", timestamp)
+        object.__setattr__(self, "stale", stale)
+        for field, _ in _SNAPSHOT_ATTRIBUTES:
+            object.__setattr__(self, field, fields[field])
+
+    def __setattr__(self, name: str, value) -> None:
+        """Reject modifications, snapshots are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        """Reject modifications, snapshots are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        """Return a short representation of the snapshot."""
+        return (
+            f"<{type(self).__name__} {self.serial_number} soc={self.soc} "
+            f"power={self.power} cells={len(self.cell_voltages)}"
+            f"{' stale' if self.stale else ''}>"
+        )
+
+    def as_dict(self) -> dict:
+        """Return the snapshot as a dictionary (the format of get_data)."""
+        data = {}
+        for field, _ in _SNAPSHOT_ATTRIBUTES:
+            value = getattr(self, field)
+            data[field] = value.tolist() if isinstance(value, array) else value
+        data["tower_data"] = _tower_data(self.tower_data)
+        return data
+
 
 class BYDHVS:
     """Class to communicate with the BYD HVS Battery system."""
 
-    def __init__(self, ip_address: str, port: int = 8080) -> None:
-        """Initialize the BYDHVS communication class."""
+    myRequests = REQUESTS
+    myErrors = ERRORS
+    myINVs = INVERTERS
+
+    def __init__(
+        self,
+        ip_address: str,
+        port: int = 8080,
+        persistent: bool = False,
+        keepalive: Optional[float] = None,
+        identity_ttl: Optional[float] = 3600.0,
+        measurement_timeout: float = 8.0,
+        adaptive_measurement: bool = False,
+        request_timeout: Optional[float] = 5.0,
+        poll_timeout: Optional[float] = None,
+        max_retries: int = 2,
+        retry_budget: int = 6,
+        metrics=None,
+        recorder=None,
+        history=None,
+        cell_stats=None,
+        summary_interval: Optional[float] = None,
+    ) -> None:
+        """Initialize the BYDHVS communication class.
+
+        Args:
+            ip_address (str): Address of the b-Box.
+            port (int): TCP port of the b-Box.
+            persistent (bool): Keep the connection open between polls
+                instead of reconnecting for every cycle.
+            keepalive (float | None): In persistent mode, send a small read
+                request after this many idle seconds so that the b-Box does
+                not drop the session and dead sockets are noticed early.
+            identity_ttl (float | None): Seconds for which serial number,
+                firmware, topology and battery/inverter type (requests 0 and
+                2) are cached before being read again. None caches them
+                until invalidated.
+            measurement_timeout (float): Seconds to wait for a cell
+                measurement before the cell data is read. With
+                adaptive_measurement this is the upper bound of the wait.
+            adaptive_measurement (bool): Poll the measurement status
+                register and read the cells as soon as the BMS reports the
+                measurement as finished. This relies on the busy flag
+                (0x8000) of register 0x0551, which has not been verified on
+                a device, so the fixed delay is the default.
+            request_timeout (float | None): Timeout in seconds for connecting
+                and for each request/response round trip.
+            poll_timeout (float | None): Total time budget of a poll. Cell
+                details are skipped if the remaining budget is too small for
+                the measurement delays (in adaptive mode: once earlier polls
+                have timed them). If the deadline passes while they are
+                read, the poll returns the summary without cells.
+            max_retries (int): How often a failed step is repeated before
+                the poll gives up.
+            retry_budget (int): Maximum number of retries within one poll.
+            metrics (PollMetrics | None): Collect hot path metrics, see
+                bydhvs.metrics.
+            recorder (FrameRecorder | None): Append all sent and received
+                frames to a capture log, see bydhvs.capture.
+            history (CellHistory | None): Keep the cell data of detailed
+                polls, the cells of all towers in tower order, see
+                bydhvs.history.
+            cell_stats (CellStatistics | None): Update lifetime statistics
+                per cell of all towers after detailed polls, see
+                bydhvs.cellstats.
+            summary_interval (float | None): While waiting for a cell
+                measurement, read the summary (request 1) on the same
+                connection at most every this many seconds and pass it to
+                the summary listeners. None disables the interleaved reads.
+
+        """
         self.ip_address = ip_address
         self.port = port
+        self.persistent = persistent
+        self.keepalive = keepalive
         self.reader = None
         self.writer = None
+        self.frame_reader = None
+        self.reconnects = 0
+        self._io_lock = None
+        self._connect_lock = None
+        self._keepalive_task = None
+        self._last_io = 0.0
+        self._fresh_session = False
+        self._session_lost = False  # Dropped by us, reconnect on next use
+        self._session_users = 0
+        self._poll_lock = None
+        self._inflight = {}
+        self._persistent_outside_context = persistent
+        self.identity_ttl = identity_ttl
+        self._identity_valid = False
+        self._identity_time = 0.0
+        self._identity_param_table = None
+        self.measurement_timeout = measurement_timeout
+        self.adaptive_measurement = adaptive_measurement
+        self.measurement_latency = None
+        self.request_timeout = request_timeout
+        self.poll_timeout = poll_timeout
+        self.round_trip_time = None
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.retry_stats = {"retries": 0, "recovered": 0, "restarts": 0, "exhausted": 0}
+        self.metrics = metrics
+        self.recorder = recorder
+        self.history = history
+        self.cell_stats = cell_stats
+        self.summary_interval = summary_interval
+        self._summary_time = 0.0
+        self._summary_listeners = []
         self.myState = 0
         self.hvsSOC = None
         self.hvsMaxVolt = None
@@ -67,10 +706,11 @@ class BYDHVS:
         self.towerAttributes = [{}]
         self.myNumberforDetails = 0
         self.FirstRun = True
-        self.cellVoltages = []
-        self.cellTemperatures = []
+        self.cellVoltages = array("h")
+        self.cellTemperatures = array("B")
         self.balancingStatus = ""
         self.balancingCount = 0
+        self.cellBalancing = array("B")
         self.hvsInvType_String = ""
         self.maxCellVoltage_mV = 0
         self.minCellVoltage_mV = 0
@@ -79,86 +719,31 @@ class BYDHVS:
         self.maxCellTempCell = 0
         self.minCellTempCell = 0
 
-        # Initialize the requests
-        self.myRequests = [
-            bytes.fromhex("010300000066c5e0"),  # 0
-            bytes.fromhex("01030500001984cc"),  # 1
-            bytes.fromhex("010300100003040e"),  # 2
-            bytes.fromhex("0110055000020400018100f853"),  # 3 Start measurement
-            bytes.fromhex("010305510001d517"),  # 4
-            bytes.fromhex("01030558004104e5"),  # 5
-            bytes.fromhex("01030558004104e5"),  # 6
-            bytes.fromhex("01030558004104e5"),  # 7
-            bytes.fromhex("01030558004104e5"),  # 8
-            # Switching for more than 4 modules
-            bytes.fromhex("01100100000306444542554700176f"),  # 9 Switch to second pass
-            bytes.fromhex(
-                "0110055000020400018100f853"
-            ),  # 10 Start measurement of remaining cells
-            bytes.fromhex("010305510001d517"),  # 11
-            bytes.fromhex("01030558004104e5"),  # 12
-            bytes.fromhex("01030558004104e5"),  # 13
-            bytes.fromhex("01030558004104e5"),  # 14
-            bytes.fromhex("01030558004104e5"),  # 15
-            bytes.fromhex("01100550000204000281000853"),  # 16 - Switch to Box 2
-        ]
-
-        self.myErrors = [
-            "High temperature during charging (cells)",
-            "Low temperature during charging (cells)",
-            "Overcurrent during discharging",
-            "Overcurrent during charging",
-            "Main circuit failure",
-            "Short circuit alarm",
-            "Cell imbalance",
-            "Current sensor error",
-            "Battery overvoltage",
-            "Battery undervoltage",
-            "Cell overvoltage",
-            "Cell undervoltage",
-            "Voltage sensor error",
-            "Temperature sensor error",
-            "High temperature during discharging (cells)",
-            "Low temperature during discharging (cells)",
-        ]
-
-        self.myINVs = [
-            "Fronius HV",  # 0
-            "Goodwe HV",  # 1
-            "Fronius HV",  # 2
-            "Kostal HV",  # 3
-            "Goodwe HV",  # 4
-            "SMA SBS3.7/5.0",  # 5
-            "Kostal HV",  # 6
-            "SMA SBS3.7/5.0",  # 7
-            "Sungrow HV",  # 8
-            "Sungrow HV",  # 9
-            "Kaco HV",  # 10
-            "Kaco HV",  # 11
-            "Ingeteam HV",  # 12
-            "Ingeteam HV",  # 13
-            "SMA SBS 2.5 HV",  # 14
-            "undefined",  # 15
-            "SMA SBS 2.5 HV",  # 16
-            "Fronius HV",  # 17
-            "undefined",  # 18
-            "SMA STP",  # 19
-        ]
-
     async def connect(self) -> None:
         """Establish a connection to the battery."""
+        await self._connect(1)
+
+    async def _connect(self, state: Optional[int]) -> None:
+        """Connect, reporting a timeout in the given state."""
+        # Before open_connection() is called, as this raises past the deadline
+        timeout = self._round_trip_timeout(state)
         try:
-            reader, writer = await asyncio.open_connection(self.ip_address, self.port)
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip_address, self.port), timeout
+            )
             self.reader = reader
             self.writer = writer
+            self.frame_reader = ModbusFrameReader(reader)
+            self._last_io = time.monotonic()
+            self._fresh_session = True
+            self._session_lost = False
             _LOGGER.debug("Connected to %s:%s", self.ip_address, self.port)
-            self.myState = 2  # Next state
-        except TimeoutError as e:
+        except (TimeoutError, asyncio.TimeoutError) as e:
             _LOGGER.error(
                 "Timeout connecting to %s:%s - %s", self.ip_address, self.port, e
             )
             raise BYDHVSTimeoutError(
-                f"Timeout connecting to {self.ip_address}:{self.port}"
+                f"Timeout connecting to {self.ip_address}:{self.port}", state
             ) from e
         except OSError as e:
             _LOGGER.error(
@@ -167,6 +752,229 @@ class BYDHVS:
             raise BYDHVSConnectionError(
                 f"OS error connecting to {self.ip_address}:{self.port}"
             ) from e
+        if self.persistent and self.keepalive:
+            self._keepalive_task = asyncio.ensure_future(self._keepalive_loop())
+
+    @property
+    def towerData(self) -> list:
+        """Return the cell data of every tower measured by the last poll.
+
+        One dictionary per tower (keys as in get_data, lists instead of
+        arrays); empty if the tower was not measured.
+        """
+        return _tower_data(self.towerAttributes)
+
+    @property
+    def balancingCells(self) -> list:
+        """Return the indices into cellVoltages of the balancing cells."""
+        return [index for index, active in enumerate(self.cellBalancing) if active]
+
+    @property
+    def device_id(self) -> str:
+        """Return the address of the b-Box as "ip_address:port"."""
+        return f"{self.ip_address}:{self.port}"
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True if the connection to the battery is usable."""
+        return (
+            self.writer is not None
+            and not self.writer.is_closing()
+            and not self.reader.at_eof()
+        )
+
+    def _get_io_lock(self) -> asyncio.Lock:
+        """Return the lock serializing request/response exchanges."""
+        # Created lazily so that it binds to the loop that actually runs us
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        return self._io_lock
+
+    def _get_connect_lock(self) -> asyncio.Lock:
+        """Return the lock serializing connects and reconnects."""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        return self._connect_lock
+
+    def _get_poll_lock(self) -> asyncio.Lock:
+        """Return the lock serializing polling cycles and summary polls."""
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        return self._poll_lock
+
+    async def _ensure_connected(self, state: Optional[int] = None) -> None:
+        """Connect, or reconnect if the current session has died."""
+        if self.is_connected:
+            return
+        async with self._get_connect_lock():
+            # Another task may have connected while we were waiting
+            if self.is_connected:
+                return
+            if self.writer is not None or self._session_lost:
+                _LOGGER.debug("Session to %s:%s lost, reconnecting",
+                              self.ip_address, self.port)
+                await self._reconnect(state)
+            else:
+                await self._connect(1 if state is None else state)
+
+    async def _reconnect(self, state: Optional[int] = None) -> None:
+        """Re-establish a lost session.
+
+        The battery may have been restarted or updated in the meantime, so
+        the cached identity is dropped as well.
+        """
+        self.reconnects += 1
+        if self.metrics is not None:
+            self.metrics.record_reconnect()
+        self.invalidate_identity()
+        await self.close()
+        await self._connect(1 if state is None else state)
+
+    @asynccontextmanager
+    async def _session(self):
+        """Provide a connection for the duration of a polling cycle.
+
+        In persistent mode the connection is kept open afterwards, otherwise
+        it is closed once the last user has left the session.
+        """
+        self._session_users += 1
+        try:
+            await self._ensure_connected()
+            yield
+        finally:
+            self._session_users -= 1
+            if not self.persistent and self._session_users == 0:
+                await self.close()
+
+    def _round_trip_timeout(self, state: Optional[int]) -> Optional[float]:
+        """Return the timeout for the next round trip.
+
+        This is request_timeout, cut short by the deadline of the running
+        poll. Raises BYDHVSTimeoutError if the poll deadline has passed.
+        """
+        timeout = self.request_timeout
+        deadline = _POLL_DEADLINE.get()
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BYDHVSTimeoutError(
+                    f"Poll deadline of {self.ip_address}:{self.port} exceeded "
+                    f"in state {state}",
+                    state,
+                )
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def _remaining_budget(self) -> Optional[float]:
+        """Return the seconds left until the poll deadline, if any."""
+        deadline = _POLL_DEADLINE.get()
+        return None if deadline is None else deadline - time.monotonic()
+
+    async def _exchange(
+        self, request: bytes, state: Optional[int] = None, resend: bool = True
+    ) -> bytes:
+        """Send a request and return the response, None on failure.
+
+        resend=False returns None instead of sending the request again on a
+        new session if a reused session was dropped.
+
+        Raises:
+            BYDHVSTimeoutError: If no response arrives in time.
+
+        """
+        async with self._get_io_lock():
+            timeout = self._round_trip_timeout(state)
+            start = time.monotonic()
+            try:
+                data = await asyncio.wait_for(
+                    self._round_trip(request, state, resend), timeout
+                )
+            except asyncio.TimeoutError as e:
+                # A late response would be taken as the answer to the next
+                # request, so the session is unusable
+                self._abort_connection()
+                _LOGGER.error("No response within %.1f s in state %s", timeout, state)
+                raise BYDHVSTimeoutError(
+                    f"No response from {self.ip_address}:{self.port} within "
+                    f"{timeout:.1f} s in state {state}",
+                    state,
+                ) from e
+            except asyncio.CancelledError:
+                self._abort_connection()
+                raise
+            elapsed = time.monotonic() - start
+            if data:
+                if self.metrics is not None:
+                    self.metrics.record_round_trip(state, elapsed)
+                if self.round_trip_time is None:
+                    self.round_trip_time = elapsed
+                else:
+                    self.round_trip_time += 0.2 * (elapsed - self.round_trip_time)
+            self._fresh_session = False
+            self._last_io = time.monotonic()
+            return data
+
+    async def _round_trip(
+        self, request: bytes, state: Optional[int] = None, resend: bool = True
+    ) -> bytes:
+        """Send a request and receive the response on the current session."""
+        reused = not self._fresh_session
+        await self.send_request(request)
+        data = await self.receive_response()
+        if not data and reused:
+            # The b-Box may have silently dropped an idle session
+            _LOGGER.debug("No response on reused session, reconnecting")
+            async with self._get_connect_lock():
+                await self._reconnect(state)
+            if resend:
+                await self.send_request(request)
+                data = await self.receive_response()
+        return data
+
+    def _abort_connection(self) -> None:
+        """Drop the connection immediately without waiting for the close."""
+        if self.writer:
+            self.writer.close()
+            self.reader = None
+            self.writer = None
+            self.frame_reader = None
+            self._session_lost = True
+            _LOGGER.debug("Connection aborted")
+
+    async def _keepalive_loop(self) -> None:
+        """Keep an idle persistent session alive."""
+        while self.writer is not None:
+            idle = time.monotonic() - self._last_io
+            if idle < self.keepalive:
+                await asyncio.sleep(self.keepalive - idle)
+                continue
+            async with self._get_io_lock():
+                try:
+                    await asyncio.wait_for(
+                        self.send_request(self.myRequests[4]), self.request_timeout
+                    )
+                    data = await asyncio.wait_for(
+                        self.receive_response(), self.request_timeout
+                    )
+                except asyncio.TimeoutError:
+                    data = None
+                self._last_io = time.monotonic()
+            if not (data and self.check_packet(data)):
+                _LOGGER.debug("Keepalive failed, dropping session")
+                await self.close()
+                self._session_lost = True
+
+    async def __aenter__(self) -> "BYDHVS":
+        """Open a persistent session owned by the context manager."""
+        self._persistent_outside_context = self.persistent
+        self.persistent = True
+        await self._ensure_connected()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        """Close the session opened by the context manager."""
+        self.persistent = self._persistent_outside_context
+        await self.close()
 
     async def send_request(self, request: bytes) -> None:
         """Send a request to the battery."""
@@ -178,6 +986,10 @@ class BYDHVS:
                 _LOGGER.error("Error sending data: %s", e)
                 self.myState = 0
             else:
+                if self.metrics is not None:
+                    self.metrics.record_sent(len(request))
+                if self.recorder is not None:
+                    self.recorder.record_sent(self.device_id, request)
                 _LOGGER.debug("Sent: %s", request.hex())
         else:
             _LOGGER.error("No connection available")
@@ -186,7 +998,7 @@ class BYDHVS:
         """Receive a response from the battery."""
         if self.reader:
             try:
-                data = await self.reader.read(1024)
+                data = await self.frame_reader.read_frame()
             except TimeoutError:
                 _LOGGER.error("Socket timeout")
                 self.myState = 0
@@ -197,6 +1009,10 @@ class BYDHVS:
                 _LOGGER.error("Error receiving data: %s", e)
                 self.myState = 0
             else:
+                if self.metrics is not None:
+                    self.metrics.record_received(len(data))
+                if self.recorder is not None:
+                    self.recorder.record_received(self.device_id, data)
                 _LOGGER.debug("Received: %s", data.hex())
                 return data
         else:
@@ -205,38 +1021,37 @@ class BYDHVS:
 
     def crc16_modbus(self, data: bytes) -> int:
         """Calculate the Modbus CRC16 of the given data."""
-        crc = 0xFFFF
-        for pos in data:
-            crc ^= pos
-            for _ in range(8):
-                if crc & 1:
-                    crc >>= 1
-                    crc ^= 0xA001
-                else:
-                    crc >>= 1
-        return crc
+        return crc16_modbus(data)
 
     def check_packet(self, data: bytes) -> bool:
         """Check if the received packet is valid."""
         if len(data) < 5:
-            return False
+            return self._reject_packet("length")
         if data[0] != 1:
-            return False
+            return self._reject_packet("header")
         function_code = data[1]
         data_length = data[2]
         packet_length = data_length + 5  # 3 Header, 2 CRC
         if function_code == 3:
             if packet_length != len(data):
-                return False
+                return self._reject_packet("length")
         elif function_code != 16:
-            return False
-        crc = self.crc16_modbus(data)
-        return crc == 0
+            return self._reject_packet("header")
+        if crc16_modbus(data) != 0:
+            return self._reject_packet("crc")
+        return True
+
+    def _reject_packet(self, reason: str) -> bool:
+        """Count a rejected packet and return False."""
+        if self.metrics is not None:
+            self.metrics.record_frame_error(reason)
+        _LOGGER.debug("Packet rejected: %s", reason)
+        return False
 
     def buf2int16SI(self, data: bytes, pos: int) -> int:
         """Convert buffer to signed 16-bit integer."""
         result = data[pos] * 256 + data[pos + 1]
-        if result > 32768:
+        if result >= 32768:
             result -= 65536
         return result
 
@@ -308,19 +1123,31 @@ class BYDHVS:
 
     def parse_packet1(self, data: bytes) -> None:
         """Parse packet 1 containing battery status information."""
-        byteArray = data
-        hvsSOC = self.buf2int16SI(byteArray, 3)
-        hvsMaxVolt = round(self.buf2int16SI(byteArray, 5) * 1.0 / 100.0, 2)
-        hvsMinVolt = round(self.buf2int16SI(byteArray, 7) * 1.0 / 100.0, 2)
-        hvsSOH = self.buf2int16SI(byteArray, 9)
-        hvsA = round(self.buf2int16SI(byteArray, 11) * 1.0 / 10.0, 1)
-        hvsBattVolt = round(self.buf2int16US(byteArray, 13) * 1.0 / 100.0, 1)
-        hvsMaxTemp = self.buf2int16SI(byteArray, 15)
-        hvsMinTemp = self.buf2int16SI(byteArray, 17)
-        hvsBatTemp = self.buf2int16SI(byteArray, 19)
-        hvsError = self.buf2int16SI(byteArray, 29)
-        hvsParamT = str(byteArray[31]) + "." + str(byteArray[32])
-        hvsOutVolt = round(self.buf2int16US(byteArray, 35) * 1.0 / 100.0, 1)
+        (
+            hvsSOC,
+            maxVolt,
+            minVolt,
+            hvsSOH,
+            current,
+            battVolt,
+            hvsMaxTemp,
+            hvsMinTemp,
+            hvsBatTemp,
+            hvsError,
+            paramMajor,
+            paramMinor,
+            outVolt,
+            chargeLow,
+            chargeHigh,
+            dischargeLow,
+            dischargeHigh,
+        ) = _PACKET1_STRUCT.unpack_from(data)
+        hvsMaxVolt = round(maxVolt / 100.0, 2)
+        hvsMinVolt = round(minVolt / 100.0, 2)
+        hvsA = round(current / 10.0, 1)
+        hvsBattVolt = round(battVolt / 100.0, 1)
+        hvsParamT = f"{paramMajor}.{paramMinor}"
+        hvsOutVolt = round(outVolt / 100.0, 1)
         hvsPower = round(hvsA * hvsOutVolt, 2)
         hvsDiffVolt = round(hvsMaxVolt - hvsMinVolt, 2)
         hvsErrorString = ""
@@ -333,8 +1160,8 @@ class BYDHVS:
         if len(hvsErrorString) == 0:
             hvsErrorString = "No Error"
 
-        hvsChargeTotal = self.buf2int32US(byteArray, 37) / 10
-        hvsDischargeTotal = self.buf2int32US(byteArray, 41) / 10
+        hvsChargeTotal = (chargeHigh * 65536 + chargeLow) / 10
+        hvsDischargeTotal = (dischargeHigh * 65536 + dischargeLow) / 10
         hvsETA = hvsDischargeTotal / hvsChargeTotal if hvsChargeTotal != 0 else 0
 
         # Store variables
@@ -415,15 +1242,15 @@ class BYDHVS:
         self.maxCellTempCell = byteArray[15]
         self.minCellTempCell = byteArray[16]
 
-        # Balancing flags (Bytes 17 to 32)
+        # Balancing flags (Bytes 17 to 32) for cells 1 to 128
         self.balancingStatus = data[17:33].hex()
-        self.balancingCount = self.count_set_bits(self.balancingStatus)
+        self.balancingCount = popcount(int.from_bytes(data[17:33], "big"))
+        self.cellBalancing = decode_balancing_block(
+            data, 17, min(self.hvsNumCells, 128)
+        )
 
         # Cell voltages (Bytes 101 to 132) for cells 1 to 16
-        self.cellVoltages = []
-        for i in range(16):
-            voltage = self.buf2int16SI(byteArray, 101 + i * 2)
-            self.cellVoltages.append(voltage)
+        self.cellVoltages = decode_int16_block(data, 101, 16)
 
     def parse_packet6(self, data: bytes) -> None:
         """Parse packet 6 containing additional cell voltages.
@@ -432,12 +1259,9 @@ class BYDHVS:
             data (bytes): The received data packet.
 
         """
-        byteArray = data
         # Voltages for cells 17 and above
         max_cells = min(self.hvsNumCells - 16, 64)  # Maximum 64 cells in this packet
-        for i in range(max_cells):
-            voltage = self.buf2int16SI(byteArray, 5 + i * 2)
-            self.cellVoltages.append(voltage)
+        self.cellVoltages.extend(decode_int16_block(data, 5, max_cells))
 
     def parse_packet7(self, data: bytes) -> None:
         """Parse packet 7 containing more cell voltages and temperatures.
@@ -446,19 +1270,13 @@ class BYDHVS:
             data (bytes): The received data packet.
 
         """
-        byteArray = data
         # Voltages for cells 81 and above
         max_cells = min(self.hvsNumCells - 80, 48)  # Maximum 48 cells in this packet
-        for i in range(max_cells):
-            voltage = self.buf2int16SI(byteArray, 5 + i * 2)
-            self.cellVoltages.append(voltage)
+        self.cellVoltages.extend(decode_int16_block(data, 5, max_cells))
 
         # Temperatures for cells 1 to 30 (Bytes 103 to 132)
-        self.cellTemperatures = []
-        max_temps = min(self.hvsNumTemps, 30)
-        for i in range(max_temps):
-            temp = byteArray[103 + i]
-            self.cellTemperatures.append(temp)
+        max_temps = max(min(self.hvsNumTemps, 30), 0)
+        self.cellTemperatures = array("B", data[103:103 + max_temps])
 
     def parse_packet8(self, data: bytes) -> None:
         """Parse packet 8 containing additional cell temperatures.
@@ -467,12 +1285,9 @@ class BYDHVS:
             data (bytes): The received data packet.
 
         """
-        byteArray = data
         # Temperatures for cells 31 and above (Bytes starting from 5)
-        max_temps = min(self.hvsNumTemps - 30, 34)
-        for i in range(max_temps):
-            temp = byteArray[5 + i]
-            self.cellTemperatures.append(temp)
+        max_temps = max(min(self.hvsNumTemps - 30, 34), 0)
+        self.cellTemperatures.frombytes(data[5:5 + max_temps])
 
     def parse_packet12(self, data: bytes) -> None:
         """Parse packet 12 containing cell voltage.
@@ -481,11 +1296,14 @@ class BYDHVS:
             data (bytes): The received data packet.
 
         """
-        byteArray = data
+        # Balancing flags (Bytes 17 to 32) for cells 129 and above
+        self.balancingStatus += data[17:33].hex()
+        self.balancingCount += popcount(int.from_bytes(data[17:33], "big"))
+        self.cellBalancing.extend(
+            decode_balancing_block(data, 17, min(self.hvsNumCells - 128, 32))
+        )
         # Cell voltages (Bytes 101 to 132) for cells 1 to 16
-        for i in range(16):
-            voltage = self.buf2int16SI(byteArray, 101 + i * 2)
-            self.cellVoltages.append(voltage)
+        self.cellVoltages.extend(decode_int16_block(data, 101, 16))
 
     def parse_packet13(self, data: bytes) -> None:
         """Parse packet 13 containing cell voltage.
@@ -494,11 +1312,8 @@ class BYDHVS:
             data (bytes): The received data packet.
 
         """
-        byteArray = data
-        # Cell voltages (Bytes 101 to 132) for cells 1 to 16
-        for i in range(16):
-            voltage = self.buf2int16SI(byteArray, 5 + i * 2)
-            self.cellVoltages.append(voltage)
+        # Cell voltages (Bytes 5 to 36) for cells 1 to 16
+        self.cellVoltages.extend(decode_int16_block(data, 5, 16))
 
     def count_set_bits(self, hex_string: str) -> int:
         """Count the number of set bits in a hex string.
@@ -510,236 +1325,698 @@ class BYDHVS:
             int: The number of bits set to 1.
 
         """
-        binary_string = bin(int(hex_string, 16))[2:]
-        return binary_string.count("1")
+        return popcount(int(hex_string, 16)) if hex_string else 0
 
     async def close(self) -> None:
         """Close the connection to the battery."""
+        self._session_lost = False
+        task = self._keepalive_task
+        self._keepalive_task = None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
         if self.writer:
-            self.writer.close()
-            await self.writer.wait_closed()
+            writer = self.writer
             self.reader = None
             self.writer = None
+            self.frame_reader = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError as e:
+                _LOGGER.debug("Error while closing connection: %s", e)
             _LOGGER.debug("Connection closed")
 
-    async def poll(self) -> None:
-        """Perform a polling cycle to retrieve data from the battery."""
-        if self.myState != 0:
-            _LOGGER.warning("Already polling")
-            return
-        self.myState = 1
-        await self.connect()
-        if self.myState == 0:
-            return  # Connection failed
+    async def poll(self) -> BYDHVSSnapshot:
+        """Perform a polling cycle to retrieve data from the battery.
 
-        # Initialize tower attributes
-        self.towerAttributes = [{} for _ in range(1)]  # Adjust for multiple towers
+        Returns a snapshot of the collected data, marked stale if a step
+        failed. If a poll is already running, the caller waits for it and
+        gets the same snapshot instead of starting a second cycle.
+        """
+        return await self._single_flight("poll", self._locked_poll)
 
-        # State 2: Send request 0
-        await self.send_request(self.myRequests[0])
-        data = await self.receive_response()
-        if data and self.check_packet(data):
-            self.parse_packet0(data)
-            self.myState = 3
-        else:
-            _LOGGER.error("Invalid or no data received in state 2")
-            self.myState = 0
-            await self.close()
-            return
+    async def _locked_poll(self) -> BYDHVSSnapshot:
+        """Run one polling cycle while holding the poll lock."""
+        async with self._get_poll_lock():
+            self._begin_poll()
+            self.myState = 1
+            try:
+                async with self._session():
+                    self.myState = 2
+                    current = await self._poll_cycle()
+            finally:
+                self.myState = 0
+            return self.snapshot(stale=not current)
 
-        # State 3: Send request 1
-        await self.send_request(self.myRequests[1])
-        data = await self.receive_response()
-        if data and self.check_packet(data):
-            self.parse_packet1(data)
-            self.myState = 4
-        else:
-            _LOGGER.error("Invalid or no data received in state 3")
-            self.myState = 0
-            await self.close()
-            return
+    def _begin_poll(self) -> None:
+        """Set deadline and retry budget of the poll in the current task."""
+        if self.poll_timeout is not None:
+            _POLL_DEADLINE.set(time.monotonic() + self.poll_timeout)
+        _RETRY_BUDGET.set(self.retry_budget)
 
-        # State 4: Send request 2
-        await self.send_request(self.myRequests[2])
-        data = await self.receive_response()
-        if data and self.check_packet(data):
-            self.parse_packet2(data)
-            # Decide whether to continue with detailed query
-            if self.hvsNumCells > 0 and self.hvsNumTemps > 0:
-                self.myState = 5
-            else:
-                self.myState = 0  # End polling if no detailed data available
-        else:
-            _LOGGER.error("Invalid or no data received in state 4")
-            self.myState = 0
-            await self.close()
-            return
+    async def _single_flight(self, key: str, func):
+        """Run func once for all concurrent callers using the same key.
 
-        # Continue with detailed query
-        if self.myState == 5:
-            # State 5: Start measurement
-            await self.send_request(self.myRequests[3])
-            data = await self.receive_response()
-            if data and self.check_packet(data):
-                # Wait time as per original code (e.g., 8 seconds)
-                await asyncio.sleep(8)
-                self.myState = 6
-            else:
-                _LOGGER.error("Invalid or no data received in state 5")
-                self.myState = 0
-                await self.close()
-                return
+        The shared task is shielded from the cancellation of a single
+        caller and is only cancelled when the last waiting caller is. A
+        cancelled task is forgotten right away; it finishes its cleanup
+        while holding the poll lock, so a new poll waits for it.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(func())
+            flight = self._inflight[key] = [task, 0]  # Task, waiting callers
+            task.add_done_callback(lambda done: self._single_flight_done(key, done))
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if flight[1] == 1 and not task.done():
+                task.cancel()
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            raise
+        finally:
+            flight[1] -= 1
+
+    def _single_flight_done(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished shared task."""
+        flight = self._inflight.get(key)
+        if flight is not None and flight[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved by the waiters, avoid warnings
+
+    async def poll_summary(self) -> BYDHVSSnapshot:
+        """Retrieve only the summary data (SOC, voltages, current, power).
+
+        The cell measurement is skipped, so once serial number and battery
+        type are known (requests 0 and 2) this costs a single round trip.
+        Returns a snapshot of the collected data, marked stale if the read
+        failed. Concurrent callers share the summary poll that is already
+        running; a running full poll is waited for.
+        """
+        return await self._single_flight("summary", self._summary_poll)
 
-            # State 6: Send request 4
-            await self.send_request(self.myRequests[4])
-            data = await self.receive_response()
-            if data and self.check_packet(data):
-                self.myState = 7
-            else:
-                _LOGGER.error("Invalid or no data received in state 6")
-                self.myState = 0
-                await self.close()
-                return
+    async def _summary_poll(self) -> BYDHVSSnapshot:
+        """Run states 2 to 4 on a session while holding the poll lock.
 
-            # State 7: Send request 5 and parse with parse_packet5
-            await self.send_request(self.myRequests[5])
-            data = await self.receive_response()
-            if data and self.check_packet(data):
-                self.parse_packet5(data)
-                self.myState = 8
-            else:
-                _LOGGER.error("Invalid or no data received in state 7")
-                self.myState = 0
-                await self.close()
+        The lock keeps the summary read from being sent between the block
+        reads of a running cell measurement.
+        """
+        async with self._get_poll_lock():
+            self._begin_poll()
+            async with self._session():
+                current = await self._poll_identity_and_summary()
+            return self.snapshot(stale=not current)
+
+    async def stream(
+        self,
+        interval: float,
+        detail: bool = True,
+        maxsize: int = 1,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+    ):
+        """Poll every interval seconds and yield the snapshots.
+
+        Polling runs in a background task, decoupled from the consumer. Up
+        to maxsize snapshots are buffered; when the buffer is full the
+        oldest snapshot is dropped (OVERFLOW_DROP_OLDEST) or polling pauses
+        until the consumer catches up (OVERFLOW_BLOCK). Use detail=False for
+        a fast stream of summary data; a summary and a detail stream can be
+        consumed side by side. Failed polls are skipped, so only current
+        data is yielded.
+
+            async for snapshot in batt.stream(1.0, detail=False):
+                ...
+        """
+        if overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        queue = asyncio.Queue(maxsize)
+        producer = asyncio.ensure_future(
+            self._stream_producer(queue, interval, detail, overflow)
+        )
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+    async def _stream_producer(
+        self, queue: asyncio.Queue, interval: float, detail: bool, overflow: str
+    ) -> None:
+        """Feed a stream() buffer with snapshots at the requested rate."""
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time()
+        while True:
+            try:
+                snapshot = await (self.poll() if detail else self.poll_summary())
+            except BYDHVSError as e:
+                _LOGGER.warning("Polling for stream failed: %s", e)
+            except Exception as e:  # Hand unexpected errors to the consumer
+                await queue.put(e)
                 return
-
-            # State 8: Send request 6 and parse with parse_packet6
-            await self.send_request(self.myRequests[6])
-            data = await self.receive_response()
-            if data and self.check_packet(data):
-                self.parse_packet6(data)
-                self.myState = 9
             else:
-                _LOGGER.error("Invalid or no data received in state 8")
-                self.myState = 0
-                await self.close()
-                return
+                if snapshot.stale:
+                    _LOGGER.warning("Polling for stream failed, skipping sample")
+                else:
+                    await _enqueue(queue, snapshot, overflow)
+            # Keep the rate, but do not try to catch up on missed polls
+            next_poll = max(next_poll + interval, loop.time())
+            await asyncio.sleep(next_poll - loop.time())
+
+    @property
+    def identity_valid(self) -> bool:
+        """Return True if the cached identity frames can be used."""
+        if not self._identity_valid:
+            return False
+        if self.identity_ttl is None:
+            return True
+        return time.monotonic() - self._identity_time < self.identity_ttl
+
+    def invalidate_identity(self) -> None:
+        """Force requests 0 and 2 to be sent again on the next poll."""
+        self._identity_valid = False
+
+    async def _poll_identity_and_summary(self) -> bool:
+        """Run states 2 to 4, skipping requests 0 and 2 while cached."""
+        bmu, bms = self.hvsBMU, self.hvsBMS
+        identity_read = False
+        if not self.identity_valid:
+            if not await self._request(2, 0, self.parse_packet0):
+                return False
+            identity_read = True
+        if not await self._request(3, 1, self.parse_packet1):
+            return False
+        self._summary_time = time.monotonic()
+        if not identity_read and self.hvsParamT != self._identity_param_table:
+            _LOGGER.info(
+                "Parameter table changed from %s to %s, reading identity again",
+                self._identity_param_table,
+                self.hvsParamT,
+            )
+            if not await self._request(3, 0, self.parse_packet0):
+                return False
+            identity_read = True
+        if identity_read:
+            if not await self._request(4, 2, self.parse_packet2):
+                return False
+            if bmu and (bmu, bms) != (self.hvsBMU, self.hvsBMS):
+                _LOGGER.info(
+                    "Firmware changed from BMU %s / BMS %s to BMU %s / BMS %s",
+                    bmu, bms, self.hvsBMU, self.hvsBMS,
+                )
+            self._identity_valid = True
+            self._identity_time = time.monotonic()
+            self._identity_param_table = self.hvsParamT
+        return True
+
+    async def _request(
+        self,
+        state: int,
+        index: int,
+        parser=None,
+        retry: bool = True,
+        request: Optional[bytes] = None,
+        resend: bool = True,
+    ) -> bool:
+        """Send request number index and parse the response.
+
+        A failed round trip is repeated (on a new connection if the old one
+        was lost) as long as retries are left. Returns False if no valid
+        frame arrived. request replaces the frame of myRequests[index].
+        resend=False never sends the request twice, not even when a dropped
+        idle session is replaced.
+
+        Raises:
+            BYDHVSError: If the last attempt failed with a timeout or a
+                connection error.
 
-            # State 9: Send request 7 and parse with parse_packet7
-            await self.send_request(self.myRequests[7])
-            data = await self.receive_response()
+        """
+        if request is None:
+            request = self.myRequests[index]
+        attempt = 0
+        while True:
+            error = None
+            try:
+                data = await self._exchange(request, state, resend)
+            except BYDHVSError as e:
+                error = e
+                data = None
             if data and self.check_packet(data):
-                self.parse_packet7(data)
-                self.myState = 10
-            else:
-                _LOGGER.error("Invalid or no data received in state 9")
-                self.myState = 0
-                await self.close()
-                return
+                if parser is not None:
+                    if self.metrics is None:
+                        parser(data)
+                    else:
+                        parse_start = time.perf_counter()
+                        parser(data)
+                        self.metrics.record_parse(
+                            parser.__name__, time.perf_counter() - parse_start
+                        )
+                if attempt:
+                    self.retry_stats["recovered"] += 1
+                return True
+            if error is None:
+                _LOGGER.error("Invalid or no data received in state %s", state)
+            if not retry or not await self._prepare_retry(state, attempt):
+                if error is not None:
+                    raise error
+                return False
+            attempt += 1
 
-            # State 10: Send request 8 and parse with parse_packet8
-            await self.send_request(self.myRequests[8])
-            data = await self.receive_response()
-            if data and self.check_packet(data):
-                self.parse_packet8(data)
-                if self.hvsModules > 4:
-                    self.myState = 0  # Polling completed
-                else:
-                    self.myState = 11  # more than 4 modules
-            else:
-                _LOGGER.error("Invalid or no data received in state 10")
-                self.myState = 0
-                await self.close()
-                return
+    async def _prepare_retry(self, state: int, attempt: int) -> bool:
+        """Take a retry from the budget and make sure we are connected.
 
-            if self.hvsModules > 4:
-                # State 11: Send request 9
-                await self.send_request(self.myRequests[9])
-                data = await self.receive_response()
-                if data and self.check_packet(data):
-                    self.myState = 12
-                else:
-                    _LOGGER.error("Invalid or no data received in state 11")
-                    self.myState = 0
-                    await self.close()
-                    return
+        Returns False if the step or the poll has no retries left.
+        """
+        budget = _RETRY_BUDGET.get()
+        if budget is None:
+            budget = self.retry_budget
+        if attempt >= self.max_retries or budget <= 0:
+            self.retry_stats["exhausted"] += 1
+            return False
+        _RETRY_BUDGET.set(budget - 1)
+        self.retry_stats["retries"] += 1
+        if self.metrics is not None:
+            self.metrics.record_retry(state)
+        _LOGGER.debug("Retrying state %s (attempt %s)", state, attempt + 2)
+        await self._ensure_connected(state)
+        return True
+
+    def add_summary_listener(self, listener) -> None:
+        """Register listener(data), called with every interleaved summary.
+
+        data is a dictionary with the summary fields of get_data() and the
+        time.time() of the sample as "timestamp". See summary_interval.
+        """
+        self._summary_listeners.append(listener)
 
-                # State 12: Start measurement
-                await self.send_request(self.myRequests[10])
-                data = await self.receive_response()
-                if data and self.check_packet(data):
-                    # Wait time as per original code (e.g., 8 seconds)
-                    await asyncio.sleep(8)
-                    self.myState = 13
-                else:
-                    _LOGGER.error("Invalid or no data received in state 12")
-                    self.myState = 0
-                    await self.close()
-                    return
+    def remove_summary_listener(self, listener) -> None:
+        """Unregister a summary listener."""
+        self._summary_listeners.remove(listener)
 
-                # State 13: Send request 11
-                await self.send_request(self.myRequests[11])
-                data = await self.receive_response()
-                if data and self.check_packet(data):
-                    self.myState = 14
-                else:
-                    _LOGGER.error("Invalid or no data received in state 13")
-                    self.myState = 0
-                    await self.close()
-                    return
+    def summary_data(self) -> dict:
+        """Return the current summary fields in the format of get_data()."""
+        data = {"timestamp": time.time()}
+        for field, attribute in _SNAPSHOT_ATTRIBUTES:
+            if field in _SUMMARY_FIELDS:
+                data[field] = getattr(self, attribute)
+        return data
 
-                # State 14: Send request 12
-                await self.send_request(self.myRequests[12])
-                data = await self.receive_response()
-                if data and self.check_packet(data):
-                    self.parse_packet12(data)
-                    self.myState = 15
-                else:
-                    _LOGGER.error("Invalid or no data received in state 14")
-                    self.myState = 0
-                    await self.close()
-                    return
+    async def _measurement_sleep(self, state: int, seconds: float) -> None:
+        """Sleep while the BMS measures, refreshing the summary meanwhile.
 
-                # State 15: Send request 13
-                await self.send_request(self.myRequests[13])
-                data = await self.receive_response()
-                if data and self.check_packet(data):
-                    self.parse_packet13(data)
-                    self.myState = 0
+        Summary reads are only sent if their round trip fits into the
+        sleep, so they never delay the next measurement status probe.
+        """
+        end = time.monotonic() + seconds
+        while self.summary_interval is not None:
+            now = time.monotonic()
+            due = max(now, self._summary_time + self.summary_interval)
+            if due + self._estimate_reads(1) > end:
+                break
+            await asyncio.sleep(due - now)
+            await self._interleaved_summary(state)
+        await asyncio.sleep(max(0.0, end - time.monotonic()))
+
+    async def _interleaved_summary(self, state: int) -> None:
+        """Read the summary during a measurement and notify the listeners."""
+        self._summary_time = time.monotonic()
+        try:
+            ok = await self._request(state, 1, self.parse_packet1, retry=False)
+        except BYDHVSError as e:
+            _LOGGER.debug("Interleaved summary read failed: %s", e)
+            return
+        if not ok:
+            return
+        if self._summary_listeners:
+            data = self.summary_data()
+            for listener in list(self._summary_listeners):
+                try:
+                    listener(data)
+                except Exception:  # A listener must not break the poll
+                    _LOGGER.exception("Error in summary listener")
+
+    async def _wait_for_measurement(self, state: int, index: int) -> bool:
+        """Wait until the BMS has finished a cell measurement.
+
+        By default this sleeps measurement_timeout seconds and then reads
+        the measurement status register (0x0551, request index) once, like
+        the original cycle. With adaptive_measurement the register is polled
+        with exponential backoff instead, assuming that the busy flag
+        (0x8000) written by the start request stays set while the BMS is
+        measuring. This meaning of the flag has not been verified on a
+        device. The first probe is scheduled shortly before the latency
+        learned on previous cycles. If the flag is still set after
+        measurement_timeout the cells are read anyway. Failed reads are
+        retried. While waiting, the summary is refreshed if
+        summary_interval is set.
+
+        Returns False if no valid frame arrived.
+        """
+        start = time.monotonic()
+        deadline = start + self.measurement_timeout
+        remaining = self._remaining_budget()
+        if remaining is not None:
+            # Leave time to read the cells before the poll deadline
+            deadline = min(deadline, start + remaining - self._estimate_reads(4))
+        if not self.adaptive_measurement:
+            delay = deadline - start
+        elif self.measurement_latency is None:
+            delay = _MEASUREMENT_FIRST_PROBE
+        else:
+            delay = max(self.measurement_latency * 0.8, _MEASUREMENT_MIN_PROBE)
+        backoff = _MEASUREMENT_MIN_PROBE
+        attempt = 0
+        while True:
+            await self._measurement_sleep(
+                state, max(0.0, min(delay, deadline - time.monotonic()))
+            )
+            error = None
+            try:
+                data = await self._exchange(self.myRequests[index], state)
+            except BYDHVSError as e:
+                error = e
+                data = None
+            if not (data and self.check_packet(data)):
+                if error is None:
+                    _LOGGER.error("Invalid or no data received in state %s", state)
+                if not await self._prepare_retry(state, attempt):
+                    if error is not None:
+                        raise error
+                    return False
+                attempt += 1
+                delay = 0.0
+                continue
+            if attempt:
+                self.retry_stats["recovered"] += 1
+                attempt = 0
+            elapsed = time.monotonic() - start
+            if not self.adaptive_measurement:
+                if self.metrics is not None:
+                    self.metrics.record_measurement_wait(state, elapsed)
+                return True
+            if not self.buf2int16US(data, 3) & _MEASUREMENT_BUSY:
+                if self.measurement_latency is None:
+                    self.measurement_latency = elapsed
                 else:
-                    _LOGGER.error("Invalid or no data received in state 15")
-                    self.myState = 0
-                    await self.close()
-                    return
+                    self.measurement_latency += 0.2 * (
+                        elapsed - self.measurement_latency
+                    )
+                _LOGGER.debug("Measurement finished after %.2f s", elapsed)
+                if self.metrics is not None:
+                    self.metrics.record_measurement_wait(state, elapsed)
+                return True
+            if time.monotonic() >= deadline:
+                _LOGGER.warning(
+                    "Measurement not finished after %.1f s in state %s, "
+                    "reading cell data anyway",
+                    elapsed,
+                    state,
+                )
+                if self.metrics is not None:
+                    self.metrics.record_measurement_wait(state, elapsed)
+                return True
+            delay = backoff
+            backoff = min(backoff * 2, _MEASUREMENT_MAX_PROBE)
+
+    async def _poll_cycle(self) -> bool:
+        """Run the polling state machine on an open connection.
+
+        Returns False if a step failed, so that the data (or part of it) is
+        still that of an earlier poll.
+        """
+        # States 2 to 4: Identity (requests 0 and 2, cached) and summary
+        if not await self._poll_identity_and_summary():
+            self.myState = 0
+            return False
 
-        # Close the connection
-        await self.close()
+        # Initialize tower attributes
+        self.towerAttributes = [{} for _ in range(max(1, self.hvsTowers))]
+
+        # States 5 to 15: Detailed query, only the steps this topology needs
+        plan = self.request_plan()
+        remaining = self._remaining_budget()
+        if plan and remaining is not None:
+            needed = self._estimate_plan(plan)
+            if needed is not None and needed > remaining:
+                _LOGGER.warning(
+                    "Skipping cell details, they need about %.1f s but only "
+                    "%.1f s of the poll budget are left",
+                    needed,
+                    remaining,
+                )
+                self._reset_cells()
+                self.myState = 0
+                return True
+        index = 0
+        pass_index = 0
+        pass_attempts = 0
+        tower = 1
+        interrupted = False
+        try:
+            while index < len(plan):
+                step = plan[index]
+                if step.tower != tower:
+                    self._store_tower(tower)
+                    tower = step.tower
+                    self._reset_cells()
+                if step.pass_start and index != pass_index:
+                    pass_index = index
+                    pass_attempts = 0
+                if step.pass_start:
+                    # Cells of earlier passes are kept when a pass is repeated
+                    pass_cells = len(self.cellVoltages)
+                    pass_temps = len(self.cellTemperatures)
+                    pass_balancing = len(self.cellBalancing)
+                    pass_status = self.balancingStatus
+                    pass_count = self.balancingCount
+                self.myState = step.state
+                if step.wait:
+                    ok = await self._wait_for_measurement(step.state, step.request)
+                elif step.parser is None:
+                    ok = await self._request(
+                        step.state, step.request, request=self._step_request(step)
+                    )
+                else:
+                    # Block reads cannot be repeated, so repeat the whole pass
+                    parser = getattr(self, step.parser)
+                    error = None
+                    try:
+                        ok = await self._request(
+                            step.state, step.request, parser, retry=False,
+                            resend=False,
+                        )
+                    except BYDHVSError as e:
+                        error = e
+                        ok = False
+                    if not ok:
+                        if not await self._prepare_retry(step.state, pass_attempts):
+                            if error is not None:
+                                raise error
+                            break
+                        _LOGGER.debug("Repeating measurement from state %s",
+                                      plan[pass_index].state)
+                        self.retry_stats["restarts"] += 1
+                        if self.metrics is not None:
+                            self.metrics.record_restart(plan[pass_index].state)
+                        pass_attempts += 1
+                        del self.cellVoltages[pass_cells:]
+                        del self.cellTemperatures[pass_temps:]
+                        del self.cellBalancing[pass_balancing:]
+                        self.balancingStatus = pass_status
+                        self.balancingCount = pass_count
+                        index = pass_index
+                        continue
+                if not ok:
+                    break
+                index += 1
+            if plan and index == len(plan):
+                self._store_tower(tower)
+        except BYDHVSTimeoutError:
+            remaining = self._remaining_budget()
+            if remaining is None or remaining > 0:
+                raise
+            # Keep the summary, only the cells of this tower are incomplete
+            _LOGGER.warning(
+                "Poll deadline reached in state %s, returning without the "
+                "cell details of tower %s",
+                self.myState,
+                tower,
+            )
+            if tower == 1:
+                self._reset_cells()
+            interrupted = True
+        finally:
+            if tower != 1 and self.towerAttributes[0]:
+                # The top level attributes describe the first tower
+                self._load_tower(1)
         self.myState = 0
+        if index < len(plan):
+            return interrupted
+        if plan:
+            self._details_complete()
+        return True
+
+    def _step_request(self, step: PlanStep) -> bytes:
+        """Return the request frame of a plan step."""
+        if step.request in _START_MEASUREMENT:
+            return start_measurement_request(step.tower)
+        return self.myRequests[step.request]
+
+    def _reset_cells(self) -> None:
+        """Drop the cell data before a tower is measured."""
+        self.cellVoltages = array("h")
+        self.cellTemperatures = array("B")
+        self.cellBalancing = array("B")
+        self.balancingStatus = ""
+        self.balancingCount = 0
+        self.maxCellVoltage_mV = 0
+        self.minCellVoltage_mV = 0
+        self.maxCellVoltageCell = 0
+        self.minCellVoltageCell = 0
+        self.maxCellTempCell = 0
+        self.minCellTempCell = 0
 
-    def get_data(self) -> dict:
-        """Retrieve the collected data."""
+    def _store_tower(self, tower: int) -> None:
+        """Save the cell data of a measured tower in towerAttributes."""
+        attributes = {}
+        for key, attribute in _TOWER_ATTRIBUTES:
+            value = getattr(self, attribute)
+            if isinstance(value, array):
+                value = array(value.typecode, value)
+            attributes[key] = value
+        self.towerAttributes[tower - 1] = attributes
+
+    def _load_tower(self, tower: int) -> None:
+        """Restore the cell data of a tower from towerAttributes."""
+        attributes = self.towerAttributes[tower - 1]
+        for key, attribute in _TOWER_ATTRIBUTES:
+            value = attributes[key]
+            if isinstance(value, array):
+                value = array(value.typecode, value)
+            setattr(self, attribute, value)
+
+    def _details_complete(self) -> None:
+        """Pass the cell data of a completed detailed query to consumers."""
+        if self.history is not None:
+            cells = self.all_tower_cells()
+            self.history.append(cells["cell_voltages"], cells["cell_temperatures"])
+        if self.cell_stats is not None:
+            self.cell_stats.update_from(self)
+
+    def all_tower_cells(self) -> dict:
+        """Return the cell data of all towers as if they were one pack.
+
+        The cells of the towers in towerAttributes are concatenated in
+        tower order, so cell 1 of tower 2 follows the last cell of tower 1,
+        and max_voltage_cell and min_voltage_cell are numbered accordingly.
+        Without stored towers the top level attributes are returned.
+
+        Returns a dictionary with cell_voltages, cell_temperatures,
+        cell_balancing, max_voltage_cell and min_voltage_cell.
+        """
+        towers = [attributes for attributes in self.towerAttributes if attributes]
+        if not towers:
+            return {
+                "cell_voltages": self.cellVoltages,
+                "cell_temperatures": self.cellTemperatures,
+                "cell_balancing": self.cellBalancing,
+                "max_voltage_cell": self.maxCellVoltageCell,
+                "min_voltage_cell": self.minCellVoltageCell,
+            }
+        if len(towers) == 1:
+            tower = towers[0]
+            return {
+                key: tower[key]
+                for key in (
+                    "cell_voltages",
+                    "cell_temperatures",
+                    "cell_balancing",
+                    "max_voltage_cell",
+                    "min_voltage_cell",
+                )
+            }
+        voltages = array("h")
+        temperatures = array("B")
+        balancing = array("B")
+        max_cell = min_cell = 0
+        highest = lowest = None
+        for tower in towers:
+            offset = len(voltages)
+            count = len(tower["cell_voltages"])
+            if count and (highest is None or tower["max_cell_voltage"] > highest):
+                highest = tower["max_cell_voltage"]
+                max_cell = offset + tower["max_voltage_cell"]
+            if count and (lowest is None or tower["min_cell_voltage"] < lowest):
+                lowest = tower["min_cell_voltage"]
+                min_cell = offset + tower["min_voltage_cell"]
+            voltages.extend(tower["cell_voltages"])
+            temperatures.extend(tower["cell_temperatures"])
+            # Keep the flags aligned with the cells of the next tower
+            flags = tower["cell_balancing"][:count]
+            balancing.extend(flags)
+            balancing.extend(bytes(count - len(flags)))
         return {
-            "serial_number": self.hvsSerial,
-            "bmu_firmware": self.hvsBMU,
-            "bms_firmware": self.hvsBMS,
-            "modules": self.hvsModules,
-            "towers": self.hvsTowers,
-            "grid_type": self.hvsGrid,
-            "soc": self.hvsSOC,
-            "max_voltage": self.hvsMaxVolt,
-            "min_voltage": self.hvsMinVolt,
-            "soh": self.hvsSOH,
-            "current": self.hvsA,
-            "battery_voltage": self.hvsBattVolt,
-            "max_temperature": self.hvsMaxTemp,
-            "min_temperature": self.hvsMinTemp,
-            "battery_temperature": self.hvsBatTemp,
-            "voltage_difference": self.hvsDiffVolt,
-            "power": self.hvsPower,
-            "error": self.hvsErrorString,
-            "cell_voltages": self.cellVoltages,
-            "cell_temperatures": self.cellTemperatures,
-            "balancing_status": self.balancingStatus,
-            "balancing_count": self.balancingCount,
-            # Additional data can be added here if needed
+            "cell_voltages": voltages,
+            "cell_temperatures": temperatures,
+            "cell_balancing": balancing,
+            "max_voltage_cell": max_cell,
+            "min_voltage_cell": min_cell,
         }
+
+    def _estimate_reads(self, count: int) -> float:
+        """Estimate the duration of count round trips."""
+        if self.round_trip_time is None:
+            return count * _DEFAULT_ROUND_TRIP
+        return count * self.round_trip_time
+
+    def _estimate_plan(self, plan) -> Optional[float]:
+        """Estimate the duration of a request plan from earlier cycles.
+
+        Returns None if the plan waits for an adaptive measurement and no
+        measurement has finished yet, so its duration is unknown.
+        """
+        waits = sum(1 for step in plan if step.wait)
+        if not waits:
+            return self._estimate_reads(len(plan))
+        if not self.adaptive_measurement:
+            measurement = self.measurement_timeout
+        elif self.measurement_latency is None:
+            return None
+        else:
+            measurement = self.measurement_latency
+        return waits * measurement + self._estimate_reads(len(plan))
+
+    def request_plan(self) -> tuple:
+        """Return the detailed query plan for the detected topology."""
+        return compile_request_plan(
+            self.hvsNumCells, self.hvsNumTemps, max(1, self.hvsTowers)
+        )
+
+    def snapshot(self, stale: bool = False) -> BYDHVSSnapshot:
+        """Return an immutable snapshot of the collected data.
+
+        stale marks a snapshot of a failed poll, which holds data of
+        earlier polls.
+        """
+        fields = {}
+        for field, attribute in _SNAPSHOT_ATTRIBUTES:
+            value = getattr(self, attribute)
+            if isinstance(value, array):
+                value = array(value.typecode, value)
+            fields[field] = value
+        # Stored tower entries are never modified, only replaced, so they
+        # are shared with the snapshot instead of copied
+        fields["tower_data"] = tuple(
+            MappingProxyType(attributes) for attributes in self.towerAttributes
+        )
+        return BYDHVSSnapshot(time.time(), stale, **fields)
+
+    def get_data(self) -> dict:
+        """Retrieve the collected data."""
+        return self.snapshot().as_dict()
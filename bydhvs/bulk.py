@@ -0,0 +1,252 @@
+"""Vectorized decoding of many BYD b-Box frames at once.
+
+The functions decode whole batches of frames of one type with NumPy
+structured dtypes (big-endian views on the frame bytes) and return column
+arrays. Offsets and scaling are those of the BYDHVS parse methods, so the
+results match decoding the frames one by one, e.g. frames collected with
+bydhvs.capture.
+
+NumPy is an optional dependency: pip install bydhvs[numpy]
+"""
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "bydhvs.bulk requires NumPy, install it with 'pip install bydhvs[numpy]'"
+    ) from e
+
+from . import _PACKET1_LAYOUT
+
+# Length of a read response carrying 0x19 (packet 1) or 0x41 (cell blocks)
+# registers: 3 header bytes, data, 2 CRC bytes
+PACKET1_LENGTH = 3 + 0x19 * 2 + 2
+BLOCK_LENGTH = 3 + 0x41 * 2 + 2
+
+_NUMPY_CODES = {"h": ">i2", "H": ">u2", "B": "u1"}
+
+# Packet -> (offset, maximum count) of the cell voltages in a cell block
+CELL_VOLTAGE_BLOCKS = {
+    "packet5": (101, 16),
+    "packet6": (5, 64),
+    "packet7": (5, 48),
+    "packet12": (101, 16),
+    "packet13": (5, 16),
+}
+# Packet -> (offset, maximum count) of the cell temperatures
+CELL_TEMPERATURE_BLOCKS = {
+    "packet7": (103, 30),
+    "packet8": (5, 34),
+}
+
+
+def layout_dtype(layout, itemsize: int) -> "np.dtype":
+    """Return a structured dtype for a (field, offset, format) layout."""
+    return np.dtype(
+        {
+            "names": [field for field, _, _ in layout],
+            "formats": [_NUMPY_CODES[code] for _, _, code in layout],
+            "offsets": [offset for _, offset, _ in layout],
+            "itemsize": itemsize,
+        }
+    )
+
+
+PACKET1_DTYPE = layout_dtype(_PACKET1_LAYOUT, PACKET1_LENGTH)
+
+
+def frame_buffer(frames, length: int) -> "np.ndarray":
+    """Return the frames as a uint8 matrix of shape [n_frames x length].
+
+    Args:
+        frames: Frames of the given length (bytes, bytearray, memoryview)
+            or a uint8 array of that shape, which is used without copying.
+        length (int): Length of every frame in bytes.
+
+    """
+    if isinstance(frames, np.ndarray):
+        buffer = frames
+    else:
+        frames = list(frames)
+        for frame in frames:
+            if len(frame) != length:
+                raise ValueError(f"Expected frames of {length} bytes, got {len(frame)}")
+        buffer = np.frombuffer(b"".join(frames), dtype=np.uint8)
+    return np.ascontiguousarray(buffer, dtype=np.uint8).reshape(-1, length)
+
+
+def _view(buffer: "np.ndarray", dtype: "np.dtype") -> "np.ndarray":
+    """Return a [n_frames] record view of a frame matrix."""
+    return buffer.view(dtype).reshape(-1)
+
+
+_TENTHS = None
+
+
+def _tenths_table() -> "np.ndarray":
+    """Return round(raw / 100.0, 1) of every uint16 raw value in 0.1 V.
+
+    parse_packet1 rounds the binary value of raw / 100.0, which neither
+    np.round nor integer rounding reproduces for every raw value (e.g. 15
+    gives 0.1). The table is built with round() on first use.
+    """
+    global _TENTHS
+    if _TENTHS is None:
+        _TENTHS = np.array(
+            [round(round(raw / 100.0, 1) * 10) for raw in range(65536)],
+            dtype=np.int64,
+        )
+    return _TENTHS
+
+
+def decode_summary(frames) -> dict:
+    """Decode packet 1 frames (summary values) into column arrays.
+
+    Returns a dictionary of arrays with the scaling and rounding of
+    parse_packet1, e.g. soc, current (A), battery_voltage (V), power (W)
+    and charge_total (kWh). power and voltage_difference are computed from
+    the integer readings; they equal the values parse_packet1 rounds to
+    0.01.
+    """
+    records = _view(frame_buffer(frames, PACKET1_LENGTH), PACKET1_DTYPE)
+    max_raw = records["max_voltage"].astype(np.int32)
+    min_raw = records["min_voltage"].astype(np.int32)
+    current_raw = records["current"].astype(np.int64)
+    tenths = _tenths_table()
+    battery_tenths = tenths[records["battery_voltage"]]
+    output_tenths = tenths[records["output_voltage"]]
+    charge_total = (
+        records["charge_total_high"].astype(np.uint32) * 65536
+        + records["charge_total_low"]
+    ) / 10
+    discharge_total = (
+        records["discharge_total_high"].astype(np.uint32) * 65536
+        + records["discharge_total_low"]
+    ) / 10
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta = np.where(charge_total != 0, discharge_total / charge_total, 0.0)
+    return {
+        "soc": records["soc"].astype(np.int16),
+        "max_voltage": max_raw / 100,
+        "min_voltage": min_raw / 100,
+        "soh": records["soh"].astype(np.int16),
+        "current": current_raw / 10,
+        "battery_voltage": battery_tenths / 10,
+        "max_temperature": records["max_temperature"].astype(np.int16),
+        "min_temperature": records["min_temperature"].astype(np.int16),
+        "battery_temperature": records["battery_temperature"].astype(np.int16),
+        "error": records["error"].astype(np.int16),
+        "param_table_major": records["param_table_major"].copy(),
+        "param_table_minor": records["param_table_minor"].copy(),
+        "output_voltage": output_tenths / 10,
+        "power": current_raw * output_tenths / 100,
+        "voltage_difference": (max_raw - min_raw) / 100,
+        "charge_total": charge_total,
+        "discharge_total": discharge_total,
+        "eta": eta,
+    }
+
+
+def decode_block(frames, offset: int, count: int, code: str = "h") -> "np.ndarray":
+    """Decode count values at offset of every cell block frame.
+
+    Returns a native [n_frames x count] array. code is "h" for voltages
+    (int16) and "B" for temperatures (uint8).
+    """
+    dtype = np.dtype(
+        {
+            "names": ["values"],
+            "formats": [(_NUMPY_CODES[code], (count,))],
+            "offsets": [offset],
+            "itemsize": BLOCK_LENGTH,
+        }
+    )
+    values = _view(frame_buffer(frames, BLOCK_LENGTH), dtype)["values"]
+    return values.astype(values.dtype.newbyteorder("="))
+
+
+def decode_cell_summary(frames) -> dict:
+    """Decode min/max values and balancing flags of packet 5 frames.
+
+    Returns arrays like the attributes set by parse_packet5:
+    max_cell_voltage (mV), min_cell_voltage, max_voltage_cell,
+    min_voltage_cell, max_temperature_cell, min_temperature_cell and
+    balancing_count.
+    """
+    buffer = frame_buffer(frames, BLOCK_LENGTH)
+    records = _view(
+        buffer,
+        np.dtype(
+            {
+                "names": ["max", "min", "max_cell", "min_cell", "max_temp", "min_temp"],
+                "formats": [">i2", ">i2", "u1", "u1", "u1", "u1"],
+                "offsets": [5, 7, 9, 10, 15, 16],
+                "itemsize": BLOCK_LENGTH,
+            }
+        ),
+    )
+    return {
+        "max_cell_voltage": records["max"].astype(np.int16),
+        "min_cell_voltage": records["min"].astype(np.int16),
+        "max_voltage_cell": records["max_cell"].copy(),
+        "min_voltage_cell": records["min_cell"].copy(),
+        "max_temperature_cell": records["max_temp"].copy(),
+        "min_temperature_cell": records["min_temp"].copy(),
+        "balancing_count": np.unpackbits(buffer[:, 17:33], axis=1).sum(
+            axis=1, dtype=np.int32
+        ),
+    }
+
+
+def decode_cell_voltages(blocks: dict, num_cells: int) -> "np.ndarray":
+    """Decode the cell voltages of many polls into a matrix.
+
+    Args:
+        blocks (dict): Packet name ("packet5", "packet6", "packet7",
+            "packet12", "packet13") -> frames. Row i of every packet must
+            belong to the same poll. Packets not needed for num_cells may
+            be omitted.
+        num_cells (int): Number of cells, hvsNumCells.
+
+    Returns:
+        int16 array of shape [n_polls x num_cells] in mV.
+
+    """
+    columns = []
+    remaining = num_cells
+    for packet in ("packet5", "packet6", "packet7", "packet12", "packet13"):
+        if remaining <= 0:
+            break
+        offset, count = CELL_VOLTAGE_BLOCKS[packet]
+        count = min(count, remaining)
+        columns.append(decode_block(blocks[packet], offset, count))
+        remaining -= count
+    if not columns:
+        return np.zeros((0, 0), dtype=np.int16)
+    return np.hstack(columns)
+
+
+def decode_cell_temperatures(blocks: dict, num_temps: int) -> "np.ndarray":
+    """Decode the cell temperatures of many polls into a matrix.
+
+    Args:
+        blocks (dict): Packet name ("packet7", "packet8") -> frames, row i
+            of every packet belonging to the same poll.
+        num_temps (int): Number of temperature sensors, hvsNumTemps.
+
+    Returns:
+        uint8 array of shape [n_polls x num_temps] in °C.
+
+    """
+    columns = []
+    remaining = num_temps
+    for packet in ("packet7", "packet8"):
+        if remaining <= 0:
+            break
+        offset, count = CELL_TEMPERATURE_BLOCKS[packet]
+        count = min(count, remaining)
+        columns.append(decode_block(blocks[packet], offset, count, "B"))
+        remaining -= count
+    if not columns:
+        return np.zeros((0, 0), dtype=np.uint8)
+    return np.hstack(columns)
@@ -0,0 +1,439 @@
+"""Capture and replay of raw BYD b-Box frames.
+
+Assign a FrameRecorder to BYDHVS.recorder (or pass it as recorder=) to
+append every request and response frame to a compact binary log. Frames
+are queued and written by a background thread, so recording does not block
+the event loop. Logs are written in segments of limited size; each new
+segment starts with the last identity reads (requests 0 and 2) of every
+device, so it can be replayed on its own. FrameLog memory-maps a segment and
+yields its frames as memoryviews without copying them, and replay() runs
+the BYDHVS parsers over captured traffic offline.
+
+Segment layout (little endian):
+
+    header: magic b"BYDCAP\\x00\\x01", wall clock time (double) and
+            time.monotonic() (double) when the segment was created
+    record: length of the rest of the record (uint32), time.monotonic()
+            (double), direction (uint8), length of the device id (uint8),
+            device id (UTF-8), frame
+"""
+
+import glob
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from . import BYDHVS, ModbusFrameReader
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"BYDCAP\x00\x01"
+DIRECTION_SENT = 0
+DIRECTION_RECEIVED = 1
+
+_HEADER = struct.Struct("<8sdd")
+_RECORD = struct.Struct("<IdBB")  # Length, timestamp, direction, id length
+_RECORD_TAIL = _RECORD.size - 4  # Bytes of the record header after the length
+_SUFFIX = ".bydcap"
+# Largest response record, kept free when a request is written to a segment
+_MAX_RESPONSE = _RECORD.size + 255 + ModbusFrameReader.MAX_FRAME
+# Registers read by the identity requests, their responses size the cell data
+_IDENTITY_ADDRESSES = (0x0000, 0x0010)
+_FLUSH = object()  # Queue marker, flush the current segment
+
+
+class CapturedFrame(NamedTuple):
+    """A frame read from a capture log."""
+
+    timestamp: float  # time.monotonic() of the capturing process
+    device: str
+    direction: int  # DIRECTION_SENT or DIRECTION_RECEIVED
+    frame: memoryview  # Only valid while the FrameLog is open
+
+
+class FrameRecorder:
+    """Append captured frames to size-rotated log segments.
+
+    record() only queues the frame; a writer thread started with the first
+    record appends it. flush() and close() wait until the queued frames are
+    written.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "bydhvs",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_segments: Optional[int] = None,
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            directory (str): Directory of the log segments, created if
+                missing.
+            prefix (str): File name prefix of the segments.
+            max_bytes (int): Start a new segment before a request whose
+                record and response could exceed this size.
+            max_segments (int | None): Delete the oldest segments beyond
+                this number. None keeps all segments.
+
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self._file = None
+        self._size = 0
+        self._start = 0  # Size of the segment before the first new record
+        self._sequence = 0
+        self._identity = {}  # Device id -> {address: (request, response)}
+        self._pending = {}  # Device id -> (address, request) awaiting a response
+        self._queue = queue.Queue()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+        segments = segment_paths(directory, prefix)
+        if segments:
+            # Continue the newest segment, existing data is never rewritten
+            self._sequence = _segment_number(segments[-1])
+            self._open(segments[-1])
+
+    @property
+    def path(self) -> Optional[str]:
+        """Return the path of the segment currently written."""
+        return self._file.name if self._file is not None else None
+
+    def _segment_path(self, sequence: int) -> str:
+        """Return the path of a segment."""
+        return os.path.join(self.directory, f"{self.prefix}-{sequence:06d}{_SUFFIX}")
+
+    def _open(self, path: str) -> None:
+        """Open a segment for appending.
+
+        A new segment gets the header and the known identity frames.
+        """
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._file.write(_HEADER.pack(MAGIC, time.time(), time.monotonic()))
+            self._size = _HEADER.size
+            for device_id, reads in self._identity.items():
+                for request, response in reads.values():
+                    self._append(device_id, DIRECTION_SENT, *request)
+                    self._append(device_id, DIRECTION_RECEIVED, *response)
+            self._start = self._size
+        else:
+            self._start = _HEADER.size
+
+    def _rotate(self) -> None:
+        """Close the current segment and start the next one."""
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        self._open(self._segment_path(self._sequence))
+        if self.max_segments is not None:
+            for path in segment_paths(self.directory, self.prefix)[
+                : -self.max_segments
+            ]:
+                os.remove(path)
+
+    def record(self, device: str, direction: int, frame: bytes) -> None:
+        """Queue a frame to be appended to the log."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._write_loop, name="bydhvs-capture", daemon=True
+            )
+            self._thread.start()
+        self._queue.put((device, direction, time.monotonic(), bytes(frame)))
+
+    def _write_loop(self) -> None:
+        """Write queued frames until close() queues None."""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if item is _FLUSH:
+                    if self._file is not None:
+                        self._file.flush()
+                else:
+                    self._write(*item)
+            except OSError:
+                _LOGGER.exception("Error writing frame capture")
+            finally:
+                self._queue.task_done()
+
+    def _write(
+        self, device: str, direction: int, timestamp: float, frame: bytes
+    ) -> None:
+        """Append a frame, rotating the segment before a request if needed.
+
+        Segments are only rotated before a request, so a response always
+        follows its request in the same segment.
+        """
+        device_id = device.encode("utf-8")[:255]
+        needed = _RECORD.size + len(device_id) + len(frame) + _MAX_RESPONSE
+        if self._file is None or (
+            direction == DIRECTION_SENT
+            and self._size > self._start
+            and self._size + needed > self.max_bytes
+        ):
+            self._rotate()
+        self._append(device_id, direction, timestamp, frame)
+        if direction == DIRECTION_SENT:
+            self._pending.pop(device_id, None)
+            if len(frame) >= 8 and frame[1] == 3:
+                address = struct.unpack_from(">H", frame, 2)[0]
+                if address in _IDENTITY_ADDRESSES:
+                    self._pending[device_id] = (address, (timestamp, frame))
+        else:
+            pending = self._pending.pop(device_id, None)
+            if pending is not None and len(frame) > 1 and frame[1] == 3:
+                address, request = pending
+                reads = self._identity.setdefault(device_id, {})
+                reads[address] = (request, (timestamp, frame))
+
+    def _append(
+        self, device_id: bytes, direction: int, timestamp: float, frame: bytes
+    ) -> None:
+        """Write a record to the current segment."""
+        length = _RECORD_TAIL + len(device_id) + len(frame)
+        write = self._file.write
+        write(_RECORD.pack(length, timestamp, direction, len(device_id)))
+        write(device_id)
+        write(frame)
+        self._size += 4 + length
+
+    def record_sent(self, device: str, frame: bytes) -> None:
+        """Append a request frame sent to a device."""
+        self.record(device, DIRECTION_SENT, frame)
+
+    def record_received(self, device: str, frame: bytes) -> None:
+        """Append a response frame received from a device."""
+        self.record(device, DIRECTION_RECEIVED, frame)
+
+    def flush(self) -> None:
+        """Write queued and buffered records to disk."""
+        if self._thread is not None:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+        elif self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Write the queued records and close the current segment."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "FrameRecorder":
+        """Return the recorder."""
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        """Close the recorder."""
+        self.close()
+
+
+def _segment_number(path: str) -> int:
+    """Return the sequence number of a segment path."""
+    return int(os.path.basename(path)[: -len(_SUFFIX)].rsplit("-", 1)[1])
+
+
+def segment_paths(directory: str, prefix: str = "bydhvs") -> list:
+    """Return the segments of a log, oldest first."""
+    paths = glob.glob(os.path.join(glob.escape(directory), f"{prefix}-*{_SUFFIX}"))
+    return sorted(paths, key=_segment_number)
+
+
+class FrameLog:
+    """Memory-mapped, read-only view of a log segment.
+
+    Frames yielded by iteration point into the mapping. Copy them with
+    bytes() if they are needed after the log is closed.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map a segment."""
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self.wall_time, self.monotonic_time = _HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a frame capture log")
+
+    def to_wall_time(self, timestamp: float) -> float:
+        """Convert a record timestamp to time.time() of the capturing host."""
+        return self.wall_time + timestamp - self.monotonic_time
+
+    def __iter__(self):
+        """Yield the CapturedFrames of the segment.
+
+        A truncated last record (e.g. after a crash) is ignored.
+        """
+        view = self._view
+        end = len(view)
+        offset = _HEADER.size
+        devices = {}
+        unpack_from = _RECORD.unpack_from
+        while offset + _RECORD.size <= end:
+            length, timestamp, direction, id_length = unpack_from(view, offset)
+            record_end = offset + 4 + length
+            if record_end > end:
+                break
+            start = offset + _RECORD.size
+            device_id = view[start:start + id_length].tobytes()
+            device = devices.get(device_id)
+            if device is None:
+                device = devices[device_id] = device_id.decode("utf-8", "replace")
+            yield CapturedFrame(
+                timestamp, device, direction, view[start + id_length:record_end]
+            )
+            offset = record_end
+
+    def close(self) -> None:
+        """Unmap the segment.
+
+        Raises BufferError while frames of the segment are still referenced.
+        """
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self) -> "FrameLog":
+        """Return the log."""
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        """Unmap the segment."""
+        self.close()
+
+
+def read_frames(paths):
+    """Yield the CapturedFrames of several segments in order.
+
+    Args:
+        paths: Segment paths, or a directory whose segments are read.
+
+    """
+    if isinstance(paths, str):
+        paths = segment_paths(paths) if os.path.isdir(paths) else [paths]
+    for path in paths:
+        log = FrameLog(path)
+        try:
+            yield from log
+        finally:
+            try:
+                log.close()
+            except BufferError:
+                pass  # Frames still referenced, unmapped once they are freed
+
+
+_FIRST_PASS_PARSERS = (
+    "parse_packet5",
+    "parse_packet6",
+    "parse_packet7",
+    "parse_packet8",
+)
+_SECOND_PASS_PARSERS = ("parse_packet12", "parse_packet13")
+_CELL_PARSERS = frozenset(_FIRST_PASS_PARSERS + _SECOND_PASS_PARSERS)
+_READ_PARSERS = {
+    0x0000: "parse_packet0",
+    0x0500: "parse_packet1",
+    0x0010: "parse_packet2",
+}
+
+
+def replay(frames, factory=None):
+    """Run the BYDHVS parsers over captured frames.
+
+    Every response is matched with the preceding request of the same
+    device. Cell blocks are assigned to packets 5 to 8 or 12 and 13 by
+    following the measurement starts, like the b-Box does. The cell count
+    comes from the identity responses; cell blocks of a device whose
+    identity was not seen yet decode no cells and a warning is logged.
+
+    Args:
+        frames: CapturedFrames, e.g. from read_frames().
+        factory: Called with the device id to create the BYDHVS instance
+            that decodes the frames of a device.
+
+    Yields:
+        (CapturedFrame, BYDHVS, parser name) after each parsed response.
+
+    """
+    if factory is None:
+        factory = BYDHVS
+    devices = {}
+    for captured in frames:
+        device = devices.get(captured.device)
+        if device is None:
+            device = devices[captured.device] = _ReplayState(factory(captured.device))
+        if captured.direction == DIRECTION_SENT:
+            device.request(captured.frame)
+            continue
+        parser, device.parser = device.parser, None
+        if parser is None or not device.batt.check_packet(captured.frame):
+            continue
+        if (
+            parser in _CELL_PARSERS
+            and device.batt.hvsNumCells == 0
+            and not device.warned
+        ):
+            device.warned = True
+            _LOGGER.warning(
+                "Cell data of %s precedes its identity frames, no cells decoded",
+                captured.device,
+            )
+        getattr(device.batt, parser)(captured.frame)
+        yield captured, device.batt, parser
+
+
+class _ReplayState:
+    """Request tracking of one device during replay()."""
+
+    __slots__ = ("batt", "parser", "block", "debug", "second_pass", "warned")
+
+    def __init__(self, batt: BYDHVS) -> None:
+        """Initialize the state of a device."""
+        self.batt = batt
+        self.parser = None  # Parser of the expected response
+        self.block = 0  # Next block of the measurement stream
+        self.debug = False  # Second pass requested for the next measurement
+        self.second_pass = False
+        self.warned = False  # Missing identity reported
+
+    def request(self, frame) -> None:
+        """Follow a sent request and select the parser of its response."""
+        self.parser = None
+        if len(frame) < 8:
+            return
+        function_code = frame[1]
+        address = struct.unpack_from(">H", frame, 2)[0]
+        if function_code == 3:
+            if address == 0x0558:
+                if self.second_pass:
+                    parsers = _SECOND_PASS_PARSERS
+                else:
+                    parsers = _FIRST_PASS_PARSERS
+                if self.block < len(parsers):
+                    self.parser = parsers[self.block]
+                self.block += 1
+            else:
+                self.parser = _READ_PARSERS.get(address)
+        elif function_code == 16:
+            if address == 0x0100:
+                self.debug = True
+            elif address == 0x0550:
+                self.second_pass = self.debug
+                self.debug = False
+                self.block = 0
@@ -0,0 +1,156 @@
+"""Lifetime statistics per battery cell.
+
+Assign a CellStatistics instance to BYDHVS.cell_stats (or pass it as
+cell_stats=) to update running statistics after every detailed poll:
+mean and variance of each cell's deviation from the pack average
+(Welford's algorithm), how often each cell was the highest or lowest cell,
+and how often it was balancing. Every update is constant time per cell and
+no samples are retained. to_dict()/from_dict() persist the state across
+restarts.
+"""
+
+from array import array
+from typing import Optional
+
+
+class CellStatistics:
+    """Streaming per-cell statistics."""
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.samples = 0
+        self.num_cells = 0
+        self._mean = array("d")  # Mean deviation from the pack average (mV)
+        self._m2 = array("d")  # Sum of squared differences from the mean
+        self.max_counts = array("L")  # Polls in which the cell was highest
+        self.min_counts = array("L")  # Polls in which the cell was lowest
+        self.balancing_counts = array("L")  # Polls in which it was balancing
+
+    def reset(self, num_cells: int = 0) -> None:
+        """Drop all statistics and track num_cells cells."""
+        self.samples = 0
+        self.num_cells = num_cells
+        self._mean = array("d", bytes(8 * num_cells))
+        self._m2 = array("d", bytes(8 * num_cells))
+        self.max_counts = array("L", [0]) * num_cells
+        self.min_counts = array("L", [0]) * num_cells
+        self.balancing_counts = array("L", [0]) * num_cells
+
+    def update(
+        self,
+        voltages,
+        max_cell: Optional[int] = None,
+        min_cell: Optional[int] = None,
+        balancing=None,
+    ) -> None:
+        """Add the result of a detailed poll.
+
+        The statistics are reset if the number of cells changed.
+
+        Args:
+            voltages: Cell voltages in mV.
+            max_cell (int | None): Number (1-based) of the highest cell.
+            min_cell (int | None): Number (1-based) of the lowest cell.
+            balancing: Per-cell balancing flags.
+
+        """
+        count = len(voltages)
+        if count == 0:
+            return
+        if count != self.num_cells:
+            self.reset(count)
+        self.samples += 1
+        samples = self.samples
+        average = sum(voltages) / count
+        means = self._mean
+        m2 = self._m2
+        for index, voltage in enumerate(voltages):
+            deviation = voltage - average
+            delta = deviation - means[index]
+            means[index] += delta / samples
+            m2[index] += delta * (deviation - means[index])
+        if max_cell is not None and 0 < max_cell <= count:
+            self.max_counts[max_cell - 1] += 1
+        if min_cell is not None and 0 < min_cell <= count:
+            self.min_counts[min_cell - 1] += 1
+        if balancing is not None:
+            counts = self.balancing_counts
+            for index, active in enumerate(balancing[:count]):
+                if active:
+                    counts[index] += 1
+
+    def update_from(self, batt) -> None:
+        """Add the cell data of a BYDHVS instance after a detailed poll.
+
+        The cells of all towers are tracked, numbered as by
+        BYDHVS.all_tower_cells().
+        """
+        cells = batt.all_tower_cells()
+        self.update(
+            cells["cell_voltages"],
+            cells["max_voltage_cell"],
+            cells["min_voltage_cell"],
+            cells["cell_balancing"],
+        )
+
+    @property
+    def mean_deviation(self) -> list:
+        """Return the mean deviation of each cell from the pack average (mV)."""
+        return list(self._mean)
+
+    @property
+    def variance(self) -> list:
+        """Return the sample variance of each cell's deviation (mV²)."""
+        if self.samples < 2:
+            return [0.0] * self.num_cells
+        return [value / (self.samples - 1) for value in self._m2]
+
+    @property
+    def std_deviation(self) -> list:
+        """Return the sample standard deviation of each cell's deviation."""
+        return [value ** 0.5 for value in self.variance]
+
+    def _frequency(self, counts) -> list:
+        """Return counts relative to the number of samples."""
+        if not self.samples:
+            return [0.0] * self.num_cells
+        return [value / self.samples for value in counts]
+
+    @property
+    def max_frequency(self) -> list:
+        """Return how often each cell was the highest cell (0 to 1)."""
+        return self._frequency(self.max_counts)
+
+    @property
+    def min_frequency(self) -> list:
+        """Return how often each cell was the lowest cell (0 to 1)."""
+        return self._frequency(self.min_counts)
+
+    @property
+    def balancing_frequency(self) -> list:
+        """Return how often each cell was balancing (0 to 1)."""
+        return self._frequency(self.balancing_counts)
+
+    def to_dict(self) -> dict:
+        """Return the state as a JSON serialisable dictionary."""
+        return {
+            "samples": self.samples,
+            "mean": list(self._mean),
+            "m2": list(self._m2),
+            "max_counts": list(self.max_counts),
+            "min_counts": list(self.min_counts),
+            "balancing_counts": list(self.balancing_counts),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CellStatistics":
+        """Restore statistics saved with to_dict()."""
+        stats = cls()
+        stats.reset(len(data["mean"]))
+        stats.samples = data["samples"]
+        stats._mean = array("d", data["mean"])
+        stats._m2 = array("d", data["m2"])
+        stats.max_counts = array("L", data["max_counts"])
+        stats.min_counts = array("L", data["min_counts"])
+        stats.balancing_counts = array("L", data["balancing_counts"])
+        return stats
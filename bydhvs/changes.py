@@ -0,0 +1,136 @@
+"""Change detection for BYD battery data.
+
+The ChangeDetector compares each new snapshot with the values it reported
+before and only returns the fields that moved by more than a per-field
+deadband. Cell voltages and temperatures are compared per cell. A full
+refresh is reported periodically so that consumers can resynchronise.
+"""
+
+import time
+from typing import NamedTuple, Optional
+
+
+class Delta(NamedTuple):
+    """Result of ChangeDetector.update()."""
+
+    full: bool  # True if changes holds the complete data
+    changes: dict  # Changed fields; sequences as {index: value} unless full
+
+
+def parse_deadband(deadband) -> tuple:
+    """Parse a deadband into an (absolute, relative) pair.
+
+    A number is an absolute deadband, a string like "5%" is relative to the
+    previously reported value.
+    """
+    if isinstance(deadband, str):
+        text = deadband.strip()
+        if not text.endswith("%"):
+            raise ValueError(f"Invalid deadband {deadband!r}")
+        return 0.0, float(text[:-1]) / 100.0
+    return float(deadband), 0.0
+
+
+def _is_number(value) -> bool:
+    """Return True for int and float values (but not bool)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _changed(old, new, deadband: tuple) -> bool:
+    """Return True if new differs from old by more than the deadband."""
+    if old is None or not (_is_number(old) and _is_number(new)):
+        return old != new
+    delta = abs(new - old)
+    if delta == 0:
+        return False
+    absolute, relative = deadband
+    return delta > max(absolute, relative * abs(old))
+
+
+class ChangeDetector:
+    """Suppress updates of values that did not change significantly."""
+
+    def __init__(
+        self,
+        deadbands: Optional[dict] = None,
+        default_deadband=0,
+        full_refresh: Optional[float] = 300.0,
+        exclude=(),
+    ) -> None:
+        """Initialize the change detector.
+
+        Args:
+            deadbands (dict | None): Deadband per field name, e.g.
+                {"cell_voltages": 2, "power": "5%"}. Deadbands of sequence
+                fields apply to every element.
+            default_deadband: Deadband for numeric fields not listed.
+            full_refresh (float | None): Report the complete data again
+                after this many seconds. None disables periodic refreshes.
+            exclude: Field names that are never reported.
+
+        """
+        self.deadbands = {
+            field: parse_deadband(deadband)
+            for field, deadband in (deadbands or {}).items()
+        }
+        self.default_deadband = parse_deadband(default_deadband)
+        self.full_refresh = full_refresh
+        self.exclude = frozenset(exclude)
+        self._reported = None
+        self._last_full = 0.0
+
+    def reset(self) -> None:
+        """Forget the reported values, the next update is a full refresh."""
+        self._reported = None
+
+    def update(self, data) -> Delta:
+        """Compare a snapshot (or get_data() dict) with the reported values.
+
+        The returned values become the new reference; suppressed changes
+        keep accumulating until they exceed the deadband.
+        """
+        if hasattr(data, "as_dict"):
+            data = data.as_dict()
+        now = time.monotonic()
+        if (
+            self._reported is None
+            or self.full_refresh is not None
+            and now - self._last_full >= self.full_refresh
+        ):
+            full = {
+                field: list(value) if isinstance(value, list) else value
+                for field, value in data.items()
+                if field not in self.exclude
+            }
+            self._reported = {
+                field: list(value) if isinstance(value, list) else value
+                for field, value in full.items()
+            }
+            self._last_full = now
+            return Delta(True, full)
+
+        reported = self._reported
+        changes = {}
+        for field, value in data.items():
+            if field in self.exclude:
+                continue
+            deadband = self.deadbands.get(field, self.default_deadband)
+            old = reported.get(field)
+            if isinstance(value, list):
+                if not isinstance(old, list) or len(old) != len(value):
+                    changes[field] = list(value)
+                    reported[field] = list(value)
+                    continue
+                changed = {
+                    index: new
+                    for index, new in enumerate(value)
+                    if _changed(old[index], new, deadband)
+                }
+                if changed:
+                    changes[field] = changed
+                    for index, new in changed.items():
+                        old[index] = new
+            elif _changed(old, value, deadband):
+                changes[field] = value
+                reported[field] = value
+        return Delta(False, changes)
@@ -0,0 +1,166 @@
+"""Poll many BYD battery systems from a single event loop.
+
+The BYDHVSFleet class schedules polls for a set of BYDHVS instances with a
+global concurrency cap, a per-device interval and random jitter, and hands
+out the results as they complete. A failing or hanging device only affects
+its own result.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import NamedTuple, Optional
+
+from . import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_OLDEST,
+    BYDHVS,
+    BYDHVSError,
+    _enqueue,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FleetResult(NamedTuple):
+    """Outcome of polling one device."""
+
+    device: BYDHVS
+    data: Optional[dict]  # Snapshot returned by a successful poll, as a dict
+    error: Optional[Exception]  # Exception raised by the poll
+    started: float  # time.time() when the poll started
+    duration: float  # Seconds spent polling (excluding queueing)
+
+
+class BYDHVSFleet:
+    """Poll a fleet of BYD battery systems with bounded concurrency."""
+
+    def __init__(
+        self,
+        devices=(),
+        max_concurrency: int = 64,
+        interval: float = 60.0,
+        jitter: float = 0.1,
+        timeout: Optional[float] = None,
+        summary: bool = False,
+    ) -> None:
+        """Initialize the fleet poller.
+
+        Args:
+            devices: BYDHVS instances to poll.
+            max_concurrency (int): Maximum number of polls running at once.
+            interval (float): Seconds between the starts of two polls of the
+                same device in run().
+            jitter (float): Relative random deviation applied to the
+                interval, so that devices do not poll in lockstep. The first
+                polls in run() are spread over a whole interval.
+            timeout (float | None): Abort a single poll after this many
+                seconds so that a hanging device cannot hold a slot forever.
+            summary (bool): Use poll_summary() instead of the full poll().
+
+        """
+        self.devices = list(devices)
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.summary = summary
+
+    def add(self, device: BYDHVS) -> None:
+        """Add a device to the fleet."""
+        self.devices.append(device)
+
+    async def _poll_device(
+        self, device: BYDHVS, semaphore: asyncio.Semaphore
+    ) -> FleetResult:
+        """Poll a single device inside a concurrency slot."""
+        async with semaphore:
+            started = time.time()
+            start = time.monotonic()
+            poll = device.poll_summary() if self.summary else device.poll()
+            try:
+                if self.timeout is None:
+                    snapshot = await poll
+                else:
+                    snapshot = await asyncio.wait_for(poll, self.timeout)
+            except Exception as e:  # Isolate failures of a single device
+                _LOGGER.debug(
+                    "Polling %s:%s failed: %r", device.ip_address, device.port, e
+                )
+                return FleetResult(
+                    device, None, e, started, time.monotonic() - start
+                )
+            duration = time.monotonic() - start
+            if snapshot.stale:
+                error = BYDHVSError(
+                    f"Polling {device.ip_address}:{device.port} failed"
+                )
+                return FleetResult(device, None, error, started, duration)
+            # Not get_data(), a concurrent poll may already have changed it
+            return FleetResult(device, snapshot.as_dict(), None, started, duration)
+
+    async def poll_once(self):
+        """Poll every device once and yield FleetResults as they complete."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.ensure_future(self._poll_device(device, semaphore))
+            for device in self.devices
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _jittered(self, delay: float) -> float:
+        """Apply the configured random jitter to a delay."""
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def _device_loop(
+        self,
+        device: BYDHVS,
+        semaphore: asyncio.Semaphore,
+        queue: asyncio.Queue,
+        overflow: str,
+    ) -> None:
+        """Poll one device every interval until cancelled."""
+        # Spread the first polls over the whole interval
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            start = time.monotonic()
+            result = await self._poll_device(device, semaphore)
+            await _enqueue(queue, result, overflow)
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(max(0.0, self._jittered(self.interval) - elapsed))
+
+    async def run(
+        self, maxsize: Optional[int] = None, overflow: str = OVERFLOW_DROP_OLDEST
+    ):
+        """Poll all devices continuously and yield FleetResults.
+
+        Results are yielded in completion order. Up to maxsize results
+        (default: one per device) are buffered; when the buffer is full the
+        oldest result is dropped (OVERFLOW_DROP_OLDEST) or the device waits
+        with its next poll until the consumer catches up (OVERFLOW_BLOCK),
+        as in BYDHVS.stream(). Closing the generator stops all polling.
+        """
+        if overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        if maxsize is None:
+            maxsize = max(1, len(self.devices))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue = asyncio.Queue(maxsize)
+        tasks = [
+            asyncio.ensure_future(
+                self._device_loop(device, semaphore, queue, overflow)
+            )
+            for device in self.devices
+        ]
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,193 @@
+"""Fixed-capacity history of cell voltages and temperatures.
+
+Assign a CellHistory to BYDHVS.history (or pass it as history=) to keep
+the cell data of the last detailed polls in NumPy ring buffers of shape
+[samples x cells] and [samples x temperatures]. Memory use is constant,
+and window statistics, spread trends and outlier cells are computed
+in-process with vectorized operations.
+
+NumPy is an optional dependency: pip install bydhvs[numpy]
+"""
+
+import time
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "bydhvs.history requires NumPy, install it with 'pip install bydhvs[numpy]'"
+    ) from e
+
+
+class CellHistory:
+    """Ring buffer of per-cell samples."""
+
+    def __init__(self, capacity: int = 1440) -> None:
+        """Initialize an empty history.
+
+        Args:
+            capacity (int): Number of samples kept. The buffers are
+                allocated on the first sample, when the number of cells and
+                temperature sensors is known.
+
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.voltages = None  # int16 [capacity x cells] in mV
+        self.temperatures = None  # uint8 [capacity x temperatures] in °C
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of stored samples."""
+        return self._count
+
+    @property
+    def num_cells(self) -> int:
+        """Return the number of cells per sample."""
+        return 0 if self.voltages is None else self.voltages.shape[1]
+
+    @property
+    def num_temps(self) -> int:
+        """Return the number of temperatures per sample."""
+        return 0 if self.temperatures is None else self.temperatures.shape[1]
+
+    def clear(self) -> None:
+        """Drop all samples."""
+        self._next = 0
+        self._count = 0
+
+    def append(self, voltages, temperatures, timestamp: Optional[float] = None) -> None:
+        """Add a sample.
+
+        The history is cleared if the number of cells or temperatures
+        differs from the stored samples, e.g. after a module was added.
+
+        Args:
+            voltages: Cell voltages in mV (e.g. BYDHVS.cellVoltages).
+            temperatures: Cell temperatures in °C.
+            timestamp (float | None): time.time() of the sample, now if None.
+
+        """
+        voltages = np.asarray(voltages, dtype=np.int16)
+        temperatures = np.asarray(temperatures, dtype=np.uint8)
+        if self.voltages is None or (
+            voltages.shape[0] != self.num_cells
+            or temperatures.shape[0] != self.num_temps
+        ):
+            self.voltages = np.zeros((self.capacity, voltages.shape[0]), np.int16)
+            self.temperatures = np.zeros(
+                (self.capacity, temperatures.shape[0]), np.uint8
+            )
+            self.clear()
+        index = self._next
+        self.voltages[index] = voltages
+        self.temperatures[index] = temperatures
+        self.timestamps[index] = time.time() if timestamp is None else timestamp
+        self._next = (index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _window(self, samples: Optional[int], seconds: Optional[float]):
+        """Return the rows of a window in chronological order.
+
+        A slice is returned if the rows are contiguous in the buffer, so
+        that the data is not copied.
+        """
+        count = self._count
+        if samples is not None:
+            count = min(count, samples)
+        start = (self._next - count) % self.capacity
+        if seconds is not None and count:
+            rows = (start + np.arange(count)) % self.capacity
+            rows = rows[self.timestamps[rows] >= time.time() - seconds]
+            if len(rows) == 0:
+                return slice(0, 0)
+            start, count = int(rows[0]), len(rows)
+        if start + count <= self.capacity:
+            return slice(start, start + count)
+        return (start + np.arange(count)) % self.capacity
+
+    def window(self, samples: Optional[int] = None, seconds: Optional[float] = None):
+        """Return (timestamps, voltages, temperatures) of a window.
+
+        Args:
+            samples (int | None): Only the most recent samples.
+            seconds (float | None): Only samples of the last seconds.
+
+        """
+        rows = self._window(samples, seconds)
+        if self.voltages is None:
+            empty = np.zeros((0, 0), np.int16), np.zeros((0, 0), np.uint8)
+            return (self.timestamps[rows],) + empty
+        return self.timestamps[rows], self.voltages[rows], self.temperatures[rows]
+
+    @staticmethod
+    def _stats(values) -> dict:
+        """Return per-column min, max, mean and standard deviation."""
+        if values.shape[0] == 0:
+            return {"min": None, "max": None, "mean": None, "std": None}
+        return {
+            "min": values.min(axis=0),
+            "max": values.max(axis=0),
+            "mean": values.mean(axis=0),
+            "std": values.std(axis=0),
+        }
+
+    def cell_stats(
+        self, samples: Optional[int] = None, seconds: Optional[float] = None
+    ) -> dict:
+        """Return min, max, mean and std per cell voltage over a window."""
+        return self._stats(self.window(samples, seconds)[1])
+
+    def temperature_stats(
+        self, samples: Optional[int] = None, seconds: Optional[float] = None
+    ) -> dict:
+        """Return min, max, mean and std per temperature over a window."""
+        return self._stats(self.window(samples, seconds)[2])
+
+    def spread(self, samples: Optional[int] = None, seconds: Optional[float] = None):
+        """Return (timestamps, max - min cell voltage in mV) per sample."""
+        timestamps, voltages, _ = self.window(samples, seconds)
+        if voltages.shape[0] == 0 or voltages.shape[1] == 0:
+            return timestamps, np.zeros(0, np.int16)
+        return timestamps, voltages.max(axis=1) - voltages.min(axis=1)
+
+    def spread_trend(
+        self, samples: Optional[int] = None, seconds: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the change of the cell voltage spread in mV per hour.
+
+        The slope of a least-squares line through the spread of the window;
+        None if fewer than two samples are available.
+        """
+        timestamps, spread = self.spread(samples, seconds)
+        if len(spread) < 2 or timestamps[-1] == timestamps[0]:
+            return None
+        hours = (timestamps - timestamps[0]) / 3600.0
+        return float(np.polyfit(hours, spread.astype(np.float64), 1)[0])
+
+    def outlier_cells(
+        self,
+        threshold: float = 3.0,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+    ):
+        """Return the indices of cells deviating from the pack.
+
+        The deviation of each cell from the pack mean is averaged over the
+        window. Cells whose mean deviation is more than threshold standard
+        deviations (of all cells' mean deviations) away are reported.
+        Indices refer to the cells of BYDHVS.all_tower_cells(), i.e. cell
+        number - 1 for a single tower.
+        """
+        voltages = self.window(samples, seconds)[1]
+        if voltages.shape[0] == 0 or voltages.shape[1] < 2:
+            return np.zeros(0, dtype=np.intp)
+        deviation = (voltages - voltages.mean(axis=1, keepdims=True)).mean(axis=0)
+        spread = deviation.std()
+        if spread == 0:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero(np.abs(deviation - deviation.mean()) > threshold * spread)
@@ -0,0 +1,176 @@
+"""Instrumentation of the BYD HVS polling hot path.
+
+Assign a PollMetrics instance to BYDHVS.metrics (or pass it as metrics=) to
+collect round trip latencies per state, measurement wait times, parse
+times, transferred bytes, rejected frames, retries, measurement restarts
+and reconnects. Without metrics
+the poller only performs a None check per event.
+
+Hooks receive every event as hook(event, value, state) and can be used to
+feed an external metrics backend. For parse events, state is the name of
+the parse method. An exception raised by a hook is logged and does not
+affect the poll.
+"""
+
+import logging
+from bisect import bisect_left
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 20.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations."""
+
+    __slots__ = ("buckets", "counts", "count", "total", "maximum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        """Initialize the histogram with the given bucket upper bounds."""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last bucket: overflow
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    @property
+    def mean(self) -> float:
+        """Return the mean of the observed values."""
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict:
+        """Return the histogram as a dictionary."""
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum,
+        }
+
+
+class PollMetrics:
+    """Counters and latency histograms of a BYDHVS instance."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        """Initialize empty metrics."""
+        self.buckets = tuple(buckets)
+        self.round_trips = {}  # State -> Histogram
+        self.measurement_waits = Histogram(self.buckets)
+        self.parse_times = {}  # Parser name -> Histogram
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.frame_errors = {}  # Reason ("crc", "length", "header") -> count
+        self.retries = 0
+        self.restarts = 0
+        self.reconnects = 0
+        self.hooks = []
+
+    def add_hook(self, hook) -> None:
+        """Register hook(event, value, state), called for every event."""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook) -> None:
+        """Unregister a hook."""
+        self.hooks.remove(hook)
+
+    def _emit(self, event: str, value, state: Optional[int] = None) -> None:
+        """Pass an event to the registered hooks."""
+        for hook in list(self.hooks):
+            try:
+                hook(event, value, state)
+            except Exception:  # A hook must not break the poll
+                _LOGGER.exception("Error in metrics hook")
+
+    def record_round_trip(self, state: Optional[int], seconds: float) -> None:
+        """Record the latency of a request/response round trip."""
+        histogram = self.round_trips.get(state)
+        if histogram is None:
+            histogram = self.round_trips[state] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if self.hooks:
+            self._emit("round_trip", seconds, state)
+
+    def record_measurement_wait(self, state: int, seconds: float) -> None:
+        """Record the time spent waiting for a cell measurement."""
+        self.measurement_waits.observe(seconds)
+        if self.hooks:
+            self._emit("measurement_wait", seconds, state)
+
+    def record_parse(self, parser: str, seconds: float) -> None:
+        """Record the time spent in a parse method."""
+        histogram = self.parse_times.get(parser)
+        if histogram is None:
+            histogram = self.parse_times[parser] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if self.hooks:
+            self._emit("parse", seconds, parser)
+
+    def record_sent(self, count: int) -> None:
+        """Record bytes sent to the battery."""
+        self.bytes_sent += count
+        if self.hooks:
+            self._emit("bytes_sent", count)
+
+    def record_received(self, count: int) -> None:
+        """Record bytes received from the battery."""
+        self.bytes_received += count
+        if self.hooks:
+            self._emit("bytes_received", count)
+
+    def record_frame_error(self, reason: str) -> None:
+        """Record a frame rejected by check_packet."""
+        self.frame_errors[reason] = self.frame_errors.get(reason, 0) + 1
+        if self.hooks:
+            self._emit("frame_error", reason)
+
+    def record_retry(self, state: int) -> None:
+        """Record a request retried after a failure."""
+        self.retries += 1
+        if self.hooks:
+            self._emit("retry", 1, state)
+
+    def record_restart(self, state: int) -> None:
+        """Record a measurement pass started again from state."""
+        self.restarts += 1
+        if self.hooks:
+            self._emit("restart", 1, state)
+
+    def record_reconnect(self) -> None:
+        """Record a re-established session."""
+        self.reconnects += 1
+        if self.hooks:
+            self._emit("reconnect", 1)
+
+    def as_dict(self) -> dict:
+        """Return all metrics as a dictionary."""
+        return {
+            "round_trips": {
+                state: histogram.as_dict()
+                for state, histogram in self.round_trips.items()
+            },
+            "measurement_waits": self.measurement_waits.as_dict(),
+            "parse_times": {
+                parser: histogram.as_dict()
+                for parser, histogram in self.parse_times.items()
+            },
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "frame_errors": dict(self.frame_errors),
+            "retries": self.retries,
+            "restarts": self.restarts,
+            "reconnects": self.reconnects,
+        }
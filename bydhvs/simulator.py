@@ -0,0 +1,444 @@
+"""Simulator of the BYD b-Box Modbus TCP interface.
+
+BYDSimulator is an asyncio TCP server answering the requests sent by
+BYDHVS with CRC-valid frames for a configurable topology (HVS/HVM/LVS,
+modules, towers). Response latency, measurement duration, TCP
+fragmentation and dropped or corrupted frames can be configured, which
+makes it usable for offline development, tests and load benchmarks.
+
+    $ python -m bydhvs.simulator --type HVS --modules 5 --port 8080
+
+start_simulators() starts many virtual devices on separate ports.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import time
+from typing import Optional
+
+from . import _PACKET1_LAYOUT, build_frame, compile_layout
+
+_LOGGER = logging.getLogger(__name__)
+
+# Cells and temperature sensors per module
+_CELLS_PER_MODULE = {"HVS": 32, "HVM": 16, "LVS": 7}
+_TEMPS_PER_MODULE = {"HVS": 12, "HVM": 8, "LVS": 0}
+# Battery type code in packet 2 and type digit in the serial number
+_TYPE_CODES = {"HVS": 2, "HVM": 1, "LVS": 0}
+_SERIAL_TYPES = {"HVS": "3", "HVM": "3", "LVS": "2"}
+_GRID_TYPES = {"OffGrid": 0, "OnGrid": 1, "Backup": 2}
+
+_PACKET1_STRUCT = compile_layout(_PACKET1_LAYOUT)
+_BLOCK_REGISTERS = 0x41
+_MEASUREMENT_BUSY = 0x8100
+
+
+class BYDSimulator:
+    """Emulate one BYD b-Box on a TCP port."""
+
+    def __init__(
+        self,
+        battery_type: str = "HVS",
+        modules: int = 4,
+        towers: int = 1,
+        grid: str = "OnGrid",
+        inverter: int = 3,
+        serial: Optional[str] = None,
+        latency: float = 0.0,
+        measurement_delay: float = 8.0,
+        fragment: Optional[int] = None,
+        drop_rate: float = 0.0,
+        corrupt_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initialize the simulated battery.
+
+        Args:
+            battery_type (str): "HVS", "HVM" or "LVS".
+            modules (int): Modules per tower (1-8).
+            towers (int): Number of towers.
+            grid (str): "OffGrid", "OnGrid" or "Backup".
+            inverter (int): Inverter type code of packet 2.
+            serial (str | None): Serial number, generated if None.
+            latency (float): Delay in seconds before every response.
+            measurement_delay (float): Seconds until a started cell
+                measurement is finished.
+            fragment (int | None): Send responses in TCP writes of at most
+                this many bytes.
+            drop_rate (float): Probability that a request is not answered.
+            corrupt_rate (float): Probability that a response has a broken
+                CRC.
+            seed (int | None): Seed for the random generator.
+
+        """
+        if battery_type not in _CELLS_PER_MODULE:
+            raise ValueError(f"Unknown battery type {battery_type!r}")
+        self.battery_type = battery_type
+        self.modules = modules
+        self.towers = towers
+        self.grid = grid
+        self.inverter = inverter
+        self.random = random.Random(seed)
+        if serial is None:
+            serial = "P0" + _SERIAL_TYPES[battery_type] + "".join(
+                self.random.choice("0123456789ABCDEF") for _ in range(16)
+            )
+        self.serial = serial
+        self.latency = latency
+        self.measurement_delay = measurement_delay
+        self.fragment = fragment
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+
+        self.bmu_version = (3, 16)
+        self.bms_version = (3, 7)
+        self.param_table = (5, 1)
+        self.summary = {
+            "soc": 80,
+            "max_voltage": 350,  # 0.01 V
+            "min_voltage": 330,  # 0.01 V
+            "soh": 100,
+            "current": -52,  # 0.1 A
+            "battery_voltage": 40500,  # 0.01 V
+            "max_temperature": 25,
+            "min_temperature": 20,
+            "battery_temperature": 22,
+            "error": 0,
+            "output_voltage": 40400,  # 0.01 V
+            "charge_total": 123400,  # 0.1 kWh
+            "discharge_total": 110000,  # 0.1 kWh
+        }
+        cells = self.num_cells
+        temps = self.num_temps
+        self.cell_voltages = [
+            [3300 + self.random.randint(-15, 15) for _ in range(cells)]
+            for _ in range(towers)
+        ]
+        self.cell_temperatures = [
+            [20 + self.random.randint(0, 5) for _ in range(temps)]
+            for _ in range(towers)
+        ]
+        self.balancing = [[False] * cells for _ in range(towers)]
+
+        self.requests = 0
+        self.connections = 0
+        self._tower = 0
+        self._second_pass = False
+        self._debug_mode = False
+        self._measurement_start = None
+        self._block = 0
+        self._server = None
+
+    @property
+    def num_cells(self) -> int:
+        """Return the number of cells per tower, as BYDHVS decodes it."""
+        return min(self.modules * _CELLS_PER_MODULE[self.battery_type], 160)
+
+    @property
+    def num_temps(self) -> int:
+        """Return the number of temperature sensors per tower."""
+        return min(self.modules * _TEMPS_PER_MODULE[self.battery_type], 64)
+
+    @property
+    def port(self) -> Optional[int]:
+        """Return the port the simulator listens on."""
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening and return the port (0 picks a free port)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "BYDSimulator":
+        """Start the simulator on a free local port."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        """Stop the simulator."""
+        await self.stop()
+
+    def measurement_busy(self) -> bool:
+        """Return True while a started measurement is still running."""
+        return (
+            self._measurement_start is not None
+            and time.monotonic() - self._measurement_start < self.measurement_delay
+        )
+
+    def handle_request(self, request: bytes) -> Optional[bytes]:
+        """Return the response frame to a request frame, None if unknown."""
+        if len(request) < 8 or request[0] != 1:
+            return None
+        function_code = request[1]
+        address, count = struct.unpack_from(">HH", request, 2)
+        if function_code == 3:
+            payload = self._read(address, count)
+            if payload is None:
+                return build_frame(bytes((1, 0x83, 2)))  # Illegal address
+            return build_frame(bytes((1, 3, len(payload))) + payload)
+        if function_code == 16:
+            values = struct.unpack_from(f">{count}H", request, 7)
+            self._write(address, values)
+            return build_frame(request[:6])
+        return build_frame(bytes((1, function_code | 0x80, 1)))
+
+    def _write(self, address: int, values) -> None:
+        """Handle a write multiple registers request."""
+        if address == 0x0100:
+            # "DEBUG" switches the next measurement to the second pass
+            self._debug_mode = True
+        elif address == 0x0550 and len(values) >= 2:
+            self._tower = max(0, min(values[0] - 1, self.towers - 1))
+            self._second_pass = self._debug_mode
+            self._debug_mode = False
+            self._measurement_start = time.monotonic()
+            self._block = 0
+            self._measure()
+
+    def _measure(self) -> None:
+        """Let the cell values of the measured tower drift a little."""
+        voltages = self.cell_voltages[self._tower]
+        for index, voltage in enumerate(voltages):
+            voltages[index] = voltage + self.random.randint(-2, 2)
+        balancing = self.balancing[self._tower]
+        average = sum(voltages) / len(voltages) if voltages else 0
+        for index, voltage in enumerate(voltages):
+            balancing[index] = voltage > average + 8
+
+    def _read(self, address: int, count: int) -> Optional[bytes]:
+        """Handle a read holding registers request."""
+        payload = bytearray(count * 2)
+        if address == 0x0000:
+            self._packet0(payload)
+        elif address == 0x0500:
+            self._packet1(payload)
+        elif address == 0x0010:
+            payload[0] = self.inverter
+            payload[2] = _TYPE_CODES[self.battery_type]
+        elif address == 0x0551:
+            status = _MEASUREMENT_BUSY if self.measurement_busy() else 0
+            struct.pack_into(">H", payload, 0, status)
+        elif address == 0x0558:
+            if not self.measurement_busy():
+                self._cell_block(payload)
+            self._block += 1
+        else:
+            return None
+        return bytes(payload)
+
+    def _packet0(self, payload: bytearray) -> None:
+        """Fill the payload of packet 0 (frame offset = payload offset + 3)."""
+        serial = self.serial.encode("ascii")[:19].ljust(19)
+        payload[0:19] = serial
+        payload[24:26] = bytes(self.bmu_version)  # BMU A
+        payload[26:28] = bytes(self.bmu_version)  # BMU B
+        payload[28:30] = bytes(self.bms_version)
+        payload[30] = 0  # Running BMU A
+        payload[31] = 1  # BMS "B"
+        payload[33] = self.towers * 16 + self.modules
+        payload[35] = _GRID_TYPES.get(self.grid, 3)
+
+    def _packet1(self, payload: bytearray) -> None:
+        """Fill the payload of packet 1 from the summary values."""
+        summary = self.summary
+        frame = bytearray(3) + payload
+        _PACKET1_STRUCT.pack_into(
+            frame,
+            0,
+            summary["soc"],
+            summary["max_voltage"],
+            summary["min_voltage"],
+            summary["soh"],
+            summary["current"],
+            summary["battery_voltage"],
+            summary["max_temperature"],
+            summary["min_temperature"],
+            summary["battery_temperature"],
+            summary["error"],
+            self.param_table[0],
+            self.param_table[1],
+            summary["output_voltage"],
+            summary["charge_total"] & 0xFFFF,
+            summary["charge_total"] >> 16,
+            summary["discharge_total"] & 0xFFFF,
+            summary["discharge_total"] >> 16,
+        )
+        payload[:] = frame[3:]
+
+    def _cell_block(self, payload: bytearray) -> None:
+        """Fill the payload of the next block of the measurement stream.
+
+        Offsets are frame offsets minus 3, see parse_packet5 to 13.
+        """
+        voltages = self.cell_voltages[self._tower]
+        temperatures = self.cell_temperatures[self._tower]
+        block = self._block
+        if self._second_pass:
+            if block == 0:
+                self._cell_summary(payload, voltages, temperatures, 128)
+                self._cells(payload, 98, voltages[128:144])
+            elif block == 1:
+                self._cells(payload, 2, voltages[144:160])
+            return
+        if block == 0:
+            self._cell_summary(payload, voltages, temperatures, 0)
+            self._cells(payload, 98, voltages[0:16])
+        elif block == 1:
+            self._cells(payload, 2, voltages[16:80])
+        elif block == 2:
+            self._cells(payload, 2, voltages[80:128])
+            payload[100:100 + min(len(temperatures), 30)] = bytes(temperatures[:30])
+        elif block == 3:
+            payload[2:2 + len(temperatures[30:64])] = bytes(temperatures[30:64])
+
+    def _cell_summary(
+        self, payload: bytearray, voltages, temperatures, first: int
+    ) -> None:
+        """Fill min/max values and balancing flags of a pass."""
+        if voltages:
+            high = max(range(len(voltages)), key=voltages.__getitem__)
+            low = min(range(len(voltages)), key=voltages.__getitem__)
+            struct.pack_into(">hhBB", payload, 2, voltages[high], voltages[low],
+                             high + 1, low + 1)
+        if temperatures:
+            high = max(range(len(temperatures)), key=temperatures.__getitem__)
+            low = min(range(len(temperatures)), key=temperatures.__getitem__)
+            payload[12] = high + 1
+            payload[13] = low + 1
+        # 8 registers of balancing flags, bit n of register k is cell 16k+n
+        flags = self.balancing[self._tower][first:first + 128]
+        for register in range(8):
+            value = 0
+            for bit, active in enumerate(flags[register * 16:register * 16 + 16]):
+                if active:
+                    value |= 1 << bit
+            struct.pack_into(">H", payload, 14 + register * 2, value)
+
+    @staticmethod
+    def _cells(payload: bytearray, offset: int, voltages) -> None:
+        """Write cell voltages as big-endian int16 starting at offset."""
+        struct.pack_into(f">{len(voltages)}h", payload, offset, *voltages)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> bytes:
+        """Read one request frame from the client."""
+        header = await reader.readexactly(7)
+        if header[1] == 16:
+            rest = await reader.readexactly(header[6] + 2)
+            return header + rest
+        return header + await reader.readexactly(1)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one client connection."""
+        self.connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                self.requests += 1
+                response = self.handle_request(request)
+                if response is None:
+                    continue
+                if self.drop_rate and self.random.random() < self.drop_rate:
+                    _LOGGER.debug("Dropping response to %s", request.hex())
+                    continue
+                if self.corrupt_rate and self.random.random() < self.corrupt_rate:
+                    response = response[:-1] + bytes((response[-1] ^ 0xFF,))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                await self._send(writer, response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, response: bytes) -> None:
+        """Send a response, fragmented if configured."""
+        if not self.fragment:
+            writer.write(response)
+            await writer.drain()
+            return
+        for start in range(0, len(response), self.fragment):
+            writer.write(response[start:start + self.fragment])
+            await writer.drain()
+            await asyncio.sleep(0)
+
+
+async def start_simulators(
+    count: int, host: str = "127.0.0.1", base_port: int = 0, **kwargs
+) -> list:
+    """Start count simulators with the same configuration.
+
+    With base_port 0 every simulator gets a free port, otherwise the ports
+    base_port to base_port + count - 1 are used. Stop them with stop().
+    """
+    simulators = []
+    for index in range(count):
+        simulator = BYDSimulator(**kwargs)
+        await simulator.start(host, base_port + index if base_port else 0)
+        simulators.append(simulator)
+    return simulators
+
+
+def main() -> None:
+    """Run simulators from the command line until interrupted."""
+    parser = argparse.ArgumentParser(description="BYD b-Box simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--count", type=int, default=1,
+                        help="number of devices on consecutive ports")
+    parser.add_argument("--type", dest="battery_type", default="HVS",
+                        choices=sorted(_CELLS_PER_MODULE))
+    parser.add_argument("--modules", type=int, default=4)
+    parser.add_argument("--towers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--measurement-delay", type=float, default=8.0)
+    parser.add_argument("--fragment", type=int, default=None)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--corrupt-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        simulators = await start_simulators(
+            args.count,
+            args.host,
+            args.port,
+            battery_type=args.battery_type,
+            modules=args.modules,
+            towers=args.towers,
+            latency=args.latency,
+            measurement_delay=args.measurement_delay,
+            fragment=args.fragment,
+            drop_rate=args.drop_rate,
+            corrupt_rate=args.corrupt_rate,
+            seed=args.seed,
+        )
+        ports = [simulator.port for simulator in simulators]
+        print(f"Simulating {len(ports)} device(s) on ports {ports[0]}-{ports[-1]}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for simulator in simulators:
+                await simulator.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Tests of the vectorized frame decoding."""
+
+import random
+import struct
+
+import pytest
+
+from bydhvs import BYDHVS, build_frame
+
+bulk = pytest.importorskip("bydhvs.bulk")
+
+# decode_summary() column -> attribute set by parse_packet1
+_SUMMARY_ATTRIBUTES = {
+    "soc": "hvsSOC",
+    "max_voltage": "hvsMaxVolt",
+    "min_voltage": "hvsMinVolt",
+    "soh": "hvsSOH",
+    "current": "hvsA",
+    "battery_voltage": "hvsBattVolt",
+    "max_temperature": "hvsMaxTemp",
+    "min_temperature": "hvsMinTemp",
+    "battery_temperature": "hvsBatTemp",
+    "output_voltage": "hvsOutVolt",
+    "power": "hvsPower",
+    "voltage_difference": "hvsDiffVolt",
+    "charge_total": "hvsChargeTotal",
+    "discharge_total": "hvsDischargeTotal",
+    "eta": "hvsETA",
+}
+
+
+def test_decode_summary_matches_parse_packet1():
+    """Random summary frames decode to exactly the values of parse_packet1.
+
+    parse_packet1 keeps the rounding of the original implementation, e.g.
+    round(raw / 100.0, 1) for the voltages.
+    """
+    generator = random.Random(20)
+    payload_length = bulk.PACKET1_LENGTH - 5
+    frames = [
+        build_frame(
+            bytes((1, 3, payload_length))
+            + bytes(generator.getrandbits(8) for _ in range(payload_length))
+        )
+        for _ in range(3000)
+    ]
+    columns = bulk.decode_summary(frames)
+    batt = BYDHVS("127.0.0.1")
+    for row, frame in enumerate(frames):
+        batt.parse_packet1(frame)
+        for column, attribute in _SUMMARY_ATTRIBUTES.items():
+            assert columns[column][row] == getattr(batt, attribute), (row, column)
+
+
+def test_decode_summary_rounds_every_voltage_like_round():
+    """Every uint16 voltage reading is rounded like round(raw / 100.0, 1)."""
+    generator = random.Random(21)
+    frames = []
+    for raw in range(65536):
+        frame = bytearray(bulk.PACKET1_LENGTH - 2)
+        frame[:3] = (1, 3, bulk.PACKET1_LENGTH - 5)
+        struct.pack_into(">h", frame, 11, generator.randint(-32768, 32767))
+        struct.pack_into(">H", frame, 13, raw)
+        struct.pack_into(">H", frame, 35, raw)
+        frames.append(build_frame(bytes(frame)))
+    columns = bulk.decode_summary(frames)
+    batt = BYDHVS("127.0.0.1")
+    for raw, frame in enumerate(frames):
+        assert columns["battery_voltage"][raw] == round(raw / 100.0, 1), raw
+        assert columns["output_voltage"][raw] == round(raw / 100.0, 1), raw
+        batt.parse_packet1(frame)
+        assert columns["power"][raw] == batt.hvsPower, raw
+    # Binary fractions below the half round down, exact halves to even
+    assert list(columns["battery_voltage"][[15, 25, 35, 75]]) == [0.1, 0.2, 0.3, 0.8]
@@ -0,0 +1,76 @@
+"""Capture and replay tests against the b-Box simulator."""
+
+import asyncio
+import logging
+
+import pytest
+
+import bydhvs
+from bydhvs import BYDHVS
+from bydhvs.capture import FrameRecorder, read_frames, replay, segment_paths
+from bydhvs.simulator import BYDSimulator
+
+
+@pytest.fixture(autouse=True)
+def _fast_measurements(monkeypatch):
+    """Probe the measurement status at once, the simulator has no delay."""
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_FIRST_PROBE", 0.0)
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_MIN_PROBE", 0.0)
+
+
+def capture_polls(directory, polls: int, **kwargs):
+    """Record polls of a simulated HVS with 5 modules."""
+
+    async def run():
+        async with BYDSimulator(
+            "HVS", modules=5, measurement_delay=0.0, seed=3
+        ) as simulator:
+            with FrameRecorder(str(directory), **kwargs) as recorder:
+                batt = BYDHVS(
+                    "127.0.0.1",
+                    simulator.port,
+                    adaptive_measurement=True,
+                    recorder=recorder,
+                )
+                for _ in range(polls):
+                    await batt.poll()
+            return batt
+
+    return asyncio.run(run())
+
+
+def replay_all(paths) -> BYDHVS:
+    """Return the decoding BYDHVS after replaying segments."""
+    batt = None
+    for _, batt, _ in replay(read_frames(paths)):
+        pass
+    return batt
+
+
+def test_segments_replay_on_their_own(tmp_path, caplog):
+    """Each rotated segment starts with the identity frames of the device."""
+    batt = capture_polls(tmp_path, 3, max_bytes=2048)
+    paths = segment_paths(str(tmp_path))
+    assert len(paths) > 2
+    with caplog.at_level(logging.WARNING, logger="bydhvs.capture"):
+        assert list(replay_all(paths).cellVoltages) == list(batt.cellVoltages)
+        for path in paths:
+            assert replay_all([path]).hvsNumCells == 160
+    assert not caplog.records
+
+
+def test_replay_warns_without_identity(tmp_path, caplog):
+    """Cell data replayed before the identity frames is reported."""
+    capture_polls(tmp_path, 1)
+    frames = list(read_frames(str(tmp_path)))
+    # Start with the first measurement, after the identity reads
+    start = next(
+        index
+        for index, frame in enumerate(frames)
+        if frame.frame[1] == 16 and bytes(frame.frame[2:4]) == b"\x05\x50"
+    )
+    with caplog.at_level(logging.WARNING, logger="bydhvs.capture"):
+        for _ in replay(frames[start:]):
+            pass
+    assert len(caplog.records) == 1
+    assert "identity" in caplog.records[0].getMessage()
@@ -0,0 +1,75 @@
+"""Tests of the streaming per-cell statistics."""
+
+import json
+import random
+import statistics
+
+import pytest
+
+from bydhvs.cellstats import CellStatistics
+
+
+def random_polls(count: int, cells: int) -> list:
+    """Return count polls of random cell voltages."""
+    generator = random.Random(22)
+    return [
+        [generator.randint(3250, 3350) for _ in range(cells)] for _ in range(count)
+    ]
+
+
+def test_welford_matches_statistics_module():
+    """Mean and variance of the deviations equal the two-pass results."""
+    polls = random_polls(200, 8)
+    stats = CellStatistics()
+    for voltages in polls:
+        stats.update(voltages)
+    deviations = [
+        [voltage - statistics.fmean(voltages) for voltage in voltages]
+        for voltages in polls
+    ]
+    for cell in range(8):
+        column = [row[cell] for row in deviations]
+        assert stats.mean_deviation[cell] == pytest.approx(statistics.fmean(column))
+        assert stats.variance[cell] == pytest.approx(statistics.variance(column))
+        assert stats.std_deviation[cell] == pytest.approx(statistics.stdev(column))
+
+
+def test_counts_and_frequencies():
+    """Highest, lowest and balancing cells are counted per poll."""
+    stats = CellStatistics()
+    stats.update([3300, 3310, 3290], max_cell=2, min_cell=3, balancing=[0, 1, 0])
+    stats.update([3300, 3310, 3290], max_cell=2, min_cell=1, balancing=[0, 1, 1])
+    assert list(stats.max_counts) == [0, 2, 0]
+    assert list(stats.min_counts) == [1, 0, 1]
+    assert stats.balancing_frequency == [0.0, 1.0, 0.5]
+    # Out of range cell numbers are ignored
+    stats.update([3300, 3310, 3290], max_cell=0, min_cell=4)
+    assert stats.samples == 3
+    assert sum(stats.max_counts) == 2
+
+
+def test_changed_cell_count_resets():
+    """Statistics start over when the number of cells changes."""
+    stats = CellStatistics()
+    stats.update([3300, 3310])
+    stats.update([3300, 3310, 3320])
+    assert stats.samples == 1
+    assert stats.num_cells == 3
+    stats.update([])
+    assert stats.samples == 1
+
+
+def test_to_dict_from_dict_round_trip():
+    """Restored statistics continue exactly like the original ones."""
+    polls = random_polls(20, 4)
+    stats = CellStatistics()
+    for voltages in polls[:10]:
+        stats.update(voltages, max_cell=1, min_cell=4, balancing=[1, 0, 0, 1])
+    restored = CellStatistics.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert restored.to_dict() == stats.to_dict()
+    assert restored.num_cells == 4
+    for voltages in polls[10:]:
+        stats.update(voltages, max_cell=2)
+        restored.update(voltages, max_cell=2)
+    assert restored.to_dict() == stats.to_dict()
+    assert restored.variance == stats.variance
@@ -0,0 +1,85 @@
+"""Tests of the deadband change detection."""
+
+import pytest
+
+from bydhvs.changes import ChangeDetector, parse_deadband
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace time.monotonic with a settable clock."""
+    now = [1000.0]
+    monkeypatch.setattr("bydhvs.changes.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_parse_deadband():
+    """Numbers are absolute deadbands, "n%" strings relative ones."""
+    assert parse_deadband(2) == (2.0, 0.0)
+    assert parse_deadband(" 5% ") == (0.0, 0.05)
+    with pytest.raises(ValueError):
+        parse_deadband("5")
+
+
+def test_relative_and_absolute_deadbands(clock):
+    """A relative deadband scales with the reported value."""
+    detector = ChangeDetector({"power": "5%", "soc": 2})
+    assert detector.update({"power": 1000.0, "soc": 50}).full
+    # 4% and 2 points are within the deadbands
+    delta = detector.update({"power": 1040.0, "soc": 52})
+    assert not delta.full
+    assert delta.changes == {}
+    delta = detector.update({"power": 1060.0, "soc": 53})
+    assert delta.changes == {"power": 1060.0, "soc": 53}
+    # The reported values are the new reference, 5% of 1060 is 53
+    assert detector.update({"power": 1110.0, "soc": 54}).changes == {}
+    assert detector.update({"power": 1114.0, "soc": 54}).changes == {"power": 1114.0}
+
+
+def test_changes_accumulate_until_reported(clock):
+    """Suppressed steps add up instead of moving the reference."""
+    detector = ChangeDetector(default_deadband=2)
+    detector.update({"voltage": 400.0})
+    assert detector.update({"voltage": 401.5}).changes == {}
+    assert detector.update({"voltage": 402.5}).changes == {"voltage": 402.5}
+
+
+def test_sequences_are_compared_per_element(clock):
+    """Only the cells outside the deadband are reported, by index."""
+    detector = ChangeDetector({"cell_voltages": 2})
+    detector.update({"cell_voltages": [3300, 3300, 3300]})
+    delta = detector.update({"cell_voltages": [3301, 3305, 3297]})
+    assert delta.changes == {"cell_voltages": {1: 3305, 2: 3297}}
+    # A different number of cells reports the whole list
+    delta = detector.update({"cell_voltages": [3300, 3300]})
+    assert delta.changes == {"cell_voltages": [3300, 3300]}
+
+
+def test_full_refresh(clock):
+    """The complete data is reported again after full_refresh seconds."""
+    detector = ChangeDetector(full_refresh=60.0)
+    data = {"soc": 50, "error": "No Error"}
+    assert detector.update(data) == (True, data)
+    clock[0] += 59.0
+    assert detector.update(data) == (False, {})
+    clock[0] += 1.0
+    assert detector.update(data) == (True, data)
+    detector.reset()
+    assert detector.update(data).full
+
+
+def test_full_refresh_disabled(clock):
+    """With full_refresh=None only the first update is complete."""
+    detector = ChangeDetector(full_refresh=None)
+    detector.update({"soc": 50})
+    clock[0] += 1e6
+    assert detector.update({"soc": 50}) == (False, {})
+
+
+def test_exclude(clock):
+    """Excluded fields are neither in full nor in partial updates."""
+    detector = ChangeDetector(exclude=("timestamp",))
+    delta = detector.update({"soc": 50, "timestamp": 1.0})
+    assert delta.changes == {"soc": 50}
+    delta = detector.update({"soc": 51, "timestamp": 2.0})
+    assert delta.changes == {"soc": 51}
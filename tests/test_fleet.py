@@ -0,0 +1,55 @@
+"""Tests of the fleet poller."""
+
+import asyncio
+import time
+
+from bydhvs import BYDHVS
+from bydhvs.fleet import BYDHVSFleet
+from bydhvs.simulator import start_simulators
+
+
+def test_poll_once_returns_every_device():
+    """Every device yields one result with the data of its poll."""
+
+    async def run():
+        simulators = await start_simulators(3, measurement_delay=0.0)
+        try:
+            fleet = BYDHVSFleet(
+                [BYDHVS("127.0.0.1", simulator.port) for simulator in simulators],
+                summary=True,
+            )
+            return [result async for result in fleet.poll_once()]
+        finally:
+            for simulator in simulators:
+                await simulator.stop()
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(result.error is None for result in results)
+    assert all(result.data["soc"] == 80 for result in results)
+
+
+def test_run_drops_oldest_results_for_slow_consumers():
+    """A slow consumer gets recent results instead of a growing backlog."""
+
+    async def run():
+        (simulator,) = await start_simulators(1, measurement_delay=0.0)
+        try:
+            fleet = BYDHVSFleet(
+                [BYDHVS("127.0.0.1", simulator.port, persistent=True)],
+                interval=0.01,
+                jitter=0.0,
+                summary=True,
+            )
+            results = fleet.run(maxsize=1)
+            await results.__anext__()
+            await asyncio.sleep(0.3)
+            result = await results.__anext__()
+            age = time.time() - result.started
+            await results.aclose()
+            await fleet.devices[0].close()
+            return age
+        finally:
+            await simulator.stop()
+
+    assert asyncio.run(run()) < 0.2
@@ -0,0 +1,48 @@
+"""Tests of the Modbus frame reader."""
+
+import asyncio
+
+import pytest
+
+from bydhvs import REQUESTS, ModbusFrameReader, build_frame
+
+READ_RESPONSE = build_frame(bytes((1, 3, 4, 0, 1, 0, 2)))
+WRITE_RESPONSE = REQUESTS[3][:6] + REQUESTS[3][-2:]
+
+
+def read_frames(chunks, count: int) -> list:
+    """Feed chunks into a stream and read count frames from it."""
+
+    async def run():
+        reader = asyncio.StreamReader()
+        for chunk in chunks:
+            reader.feed_data(chunk)
+        reader.feed_eof()
+        frame_reader = ModbusFrameReader(reader)
+        return [await frame_reader.read_frame() for _ in range(count)]
+
+    return asyncio.run(run())
+
+
+def test_coalesced_frames_are_split():
+    """Several frames in one chunk are returned one by one."""
+    frames = read_frames([READ_RESPONSE + WRITE_RESPONSE + READ_RESPONSE], 3)
+    assert frames == [READ_RESPONSE, WRITE_RESPONSE, READ_RESPONSE]
+
+
+def test_fragmented_frame_is_joined():
+    """A frame arriving byte by byte is returned in one piece."""
+    chunks = [READ_RESPONSE[index:index + 1] for index in range(len(READ_RESPONSE))]
+    assert read_frames(chunks, 1) == [READ_RESPONSE]
+
+
+def test_garbage_is_discarded():
+    """Bytes that cannot start a frame are skipped."""
+    frames = read_frames([b"\x00\x07\x01\x55" + READ_RESPONSE + WRITE_RESPONSE], 2)
+    assert frames == [READ_RESPONSE, WRITE_RESPONSE]
+
+
+def test_truncated_frame_raises():
+    """The stream ending in the middle of a frame is reported."""
+    with pytest.raises(asyncio.IncompleteReadError):
+        read_frames([READ_RESPONSE[:-1]], 1)
@@ -0,0 +1,62 @@
+"""Tests of the cell history ring buffer."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+CellHistory = pytest.importorskip("bydhvs.history").CellHistory
+
+
+def test_ring_buffer_wraps_around():
+    """The oldest samples are overwritten and windows stay chronological."""
+    history = CellHistory(capacity=4)
+    for sample in range(6):
+        history.append([3300 + sample, 3310], [20], timestamp=100.0 + sample)
+    assert len(history) == 4
+    timestamps, voltages, temperatures = history.window()
+    assert list(timestamps) == [102.0, 103.0, 104.0, 105.0]
+    assert list(voltages[:, 0]) == [3302, 3303, 3304, 3305]
+    assert temperatures.shape == (4, 1)
+    assert list(history.window(samples=2)[1][:, 0]) == [3304, 3305]
+
+
+def test_changed_cell_count_clears_history():
+    """A sample with another number of cells starts a new history."""
+    history = CellHistory(capacity=4)
+    history.append([3300, 3310], [20])
+    history.append([3300, 3310, 3320], [20])
+    assert len(history) == 1
+    assert history.num_cells == 3
+
+
+def test_window_by_seconds(monkeypatch):
+    """Only samples newer than seconds are in the window."""
+    monkeypatch.setattr("bydhvs.history.time.time", lambda: 1000.0)
+    history = CellHistory(capacity=3)
+    for timestamp in (900.0, 950.0, 980.0, 990.0):
+        history.append([3300], [20], timestamp=timestamp)
+    timestamps = history.window(seconds=30.0)[0]
+    assert list(timestamps) == [980.0, 990.0]
+
+
+def test_spread_trend():
+    """The spread growing 6 mV per sample every 10 minutes is 36 mV/h."""
+    history = CellHistory(capacity=5)
+    assert history.spread_trend() is None
+    for sample in range(8):
+        history.append([3300, 3300 + 6 * sample], [20], timestamp=600.0 * sample)
+    assert history.spread_trend() == pytest.approx(36.0)
+    assert list(history.spread()[1]) == [18, 24, 30, 36, 42]
+
+
+def test_outlier_cells():
+    """A cell far from the pack is reported, the others are not."""
+    history = CellHistory(capacity=10)
+    generator = np.random.default_rng(1)
+    for _ in range(10):
+        voltages = 3300 + generator.integers(-2, 3, 16)
+        voltages[5] -= 40
+        history.append(voltages, [20])
+    assert list(history.outlier_cells()) == [5]
+    assert list(history.outlier_cells(threshold=10.0)) == []
+    history.clear()
+    assert len(history.outlier_cells()) == 0
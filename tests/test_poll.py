@@ -0,0 +1,243 @@
+"""Polling tests against the b-Box simulator."""
+
+import asyncio
+import time
+
+import pytest
+
+import bydhvs
+from bydhvs import BYDHVS
+from bydhvs.cellstats import CellStatistics
+from bydhvs.metrics import PollMetrics
+from bydhvs.simulator import BYDSimulator
+
+
+@pytest.fixture(autouse=True)
+def _fast_measurements(monkeypatch):
+    """Probe the measurement status at once, the simulator has no delay."""
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_FIRST_PROBE", 0.0)
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_MIN_PROBE", 0.0)
+
+
+def battery(port: int, **kwargs) -> BYDHVS:
+    """Return a BYDHVS for a simulator, with adaptive measurement waits."""
+    return BYDHVS("127.0.0.1", port, adaptive_measurement=True, **kwargs)
+
+
+class DroppingSimulator(BYDSimulator):
+    """Simulator that drops the session after serving a cell block."""
+
+    def __init__(self, *args, drop_after_block: int, **kwargs) -> None:
+        """Drop the session once block drop_after_block was read."""
+        super().__init__(*args, **kwargs)
+        self.drop_after_block = drop_after_block
+        self.dropped = False
+
+    def handle_request(self, request: bytes):
+        """Serve a request, dropping the session after the chosen block."""
+        response = super().handle_request(request)
+        if (
+            not self.dropped
+            and request[2:4] == b"\x05\x58"
+            and self._block == self.drop_after_block + 1
+        ):
+            self.dropped = True
+            raise ConnectionResetError("Session dropped")
+        return response
+
+
+class RecordingSimulator(BYDSimulator):
+    """Simulator remembering the register of every read request."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Start with an empty request log."""
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    def handle_request(self, request: bytes):
+        """Log the register of a read request and serve it."""
+        if request[1] == 0x03:
+            self.reads.append(int.from_bytes(request[2:4], "big"))
+        return super().handle_request(request)
+
+
+def test_dropped_session_repeats_measurement_pass():
+    """A block read lost with a session must not be sent again.
+
+    The block stream has moved on, so a resent read returns the next block.
+    The pass is started again instead and the cells stay in order.
+    """
+
+    async def run():
+        async with DroppingSimulator(
+            "HVS", modules=4, measurement_delay=0.0, seed=3, drop_after_block=2
+        ) as simulator:
+            batt = battery(simulator.port, persistent=True)
+            try:
+                await batt.poll()
+            finally:
+                await batt.close()
+            return simulator, batt
+
+    simulator, batt = asyncio.run(run())
+    assert simulator.dropped
+    assert batt.retry_stats["restarts"] == 1
+    assert batt.reconnects == 1
+    assert list(batt.cellVoltages) == simulator.cell_voltages[0]
+    assert list(batt.cellTemperatures) == simulator.cell_temperatures[0]
+
+
+def test_metrics_report_restart_and_survive_failing_hook():
+    """Retries and restarts are emitted, a failing hook does not stop the poll."""
+    events = []
+
+    def failing_hook(event, value, state):
+        raise RuntimeError("Broken backend")
+
+    def hook(event, value, state):
+        if event in ("retry", "restart"):
+            events.append((event, state))
+
+    async def run():
+        async with DroppingSimulator(
+            "HVS", modules=4, measurement_delay=0.0, seed=3, drop_after_block=2
+        ) as simulator:
+            metrics = PollMetrics()
+            metrics.add_hook(failing_hook)
+            metrics.add_hook(hook)
+            batt = battery(simulator.port, persistent=True, metrics=metrics)
+            try:
+                snapshot = await batt.poll()
+            finally:
+                await batt.close()
+            return simulator, metrics, snapshot
+
+    simulator, metrics, snapshot = asyncio.run(run())
+    assert not snapshot.stale
+    assert list(snapshot.cell_voltages) == simulator.cell_voltages[0]
+    assert metrics.retries == 1
+    assert metrics.restarts == 1
+    assert [event for event, _ in events] == ["retry", "restart"]
+    assert metrics.as_dict()["restarts"] == 1
+
+
+def test_poll_deadline_before_measurement_latency_is_known():
+    """The first poll reads the cells even if the budget is short."""
+
+    async def run():
+        async with BYDSimulator("HVS", modules=5, measurement_delay=0.0) as simulator:
+            batt = battery(simulator.port, poll_timeout=5.0)
+            return await batt.poll()
+
+    snapshot = asyncio.run(run())
+    assert len(snapshot.cell_voltages) == 160
+
+
+def test_poll_deadline_keeps_summary():
+    """Cell details cut short by poll_timeout leave the summary intact."""
+
+    async def run():
+        async with BYDSimulator(
+            "HVS", modules=5, measurement_delay=0.0, seed=3
+        ) as simulator:
+            batt = battery(simulator.port, persistent=True)
+            try:
+                await batt.poll()
+                # Slow responses now exceed the budget in the middle of the scan
+                simulator.latency = 0.05
+                batt.poll_timeout = 0.4
+                return await batt.poll()
+            finally:
+                await batt.close()
+
+    snapshot = asyncio.run(run())
+    assert snapshot.soc == 80
+    assert snapshot.modules == 5
+    assert len(snapshot.cell_voltages) == 0
+    assert snapshot.balancing_count == 0
+
+
+def test_balancing_of_second_pass_is_counted():
+    """balancing_count includes the cells read in the second pass."""
+
+    async def run():
+        async with BYDSimulator(
+            "HVS", modules=5, measurement_delay=0.0, seed=3
+        ) as simulator:
+            batt = battery(simulator.port)
+            await batt.poll()
+            return batt
+
+    batt = asyncio.run(run())
+    cells = batt.balancingCells
+    assert any(index >= 128 for index in cells)
+    assert batt.balancingCount == len(cells)
+    assert batt.count_set_bits(batt.balancingStatus) == len(cells)
+
+
+def test_fixed_measurement_delay_is_default():
+    """Without adaptive_measurement every measurement waits the full delay."""
+
+    async def run():
+        async with BYDSimulator("HVS", modules=5, measurement_delay=0.0) as simulator:
+            batt = BYDHVS("127.0.0.1", simulator.port, measurement_timeout=0.2)
+            start = time.monotonic()
+            await batt.poll()
+            return batt, time.monotonic() - start
+
+    batt, elapsed = asyncio.run(run())
+    assert len(batt.cellVoltages) == 160
+    assert elapsed >= 0.4  # Two measurement passes
+    assert batt.measurement_latency is None
+
+
+def test_summary_poll_waits_for_running_poll():
+    """A summary read is never sent between the block reads of a poll."""
+
+    async def run():
+        async with RecordingSimulator(
+            "HVS", modules=5, measurement_delay=0.0, latency=0.01
+        ) as simulator:
+            batt = battery(simulator.port, persistent=True)
+            try:
+                poll = asyncio.ensure_future(batt.poll())
+                while 0x0558 not in simulator.reads:
+                    await asyncio.sleep(0.005)
+                summary = await batt.poll_summary()
+                await poll
+            finally:
+                await batt.close()
+            return simulator, summary
+
+    simulator, summary = asyncio.run(run())
+    blocks = [i for i, register in enumerate(simulator.reads) if register == 0x0558]
+    assert 0x0500 not in simulator.reads[blocks[0] : blocks[-1]]
+    assert simulator.reads[-1] == 0x0500
+    assert not summary.stale
+
+
+@pytest.mark.parametrize("towers", [2, 3])
+def test_poll_reads_every_tower(towers):
+    """Each tower is measured on its own and fed to the cell statistics."""
+
+    async def run():
+        async with BYDSimulator(
+            "HVS", modules=4, towers=towers, measurement_delay=0.0, seed=5
+        ) as simulator:
+            batt = battery(simulator.port, cell_stats=CellStatistics())
+            return simulator, batt, await batt.poll()
+
+    simulator, batt, snapshot = asyncio.run(run())
+    assert len(snapshot.tower_data) == towers
+    for tower, data in enumerate(snapshot.tower_data):
+        assert list(data["cell_voltages"]) == simulator.cell_voltages[tower]
+        assert list(data["cell_temperatures"]) == simulator.cell_temperatures[tower]
+    # The top level attributes describe the first tower
+    assert list(snapshot.cell_voltages) == simulator.cell_voltages[0]
+    cells = batt.all_tower_cells()
+    voltages = [v for tower in simulator.cell_voltages for v in tower]
+    assert list(cells["cell_voltages"]) == voltages
+    assert voltages[cells["max_voltage_cell"] - 1] == max(voltages)
+    assert voltages[cells["min_voltage_cell"] - 1] == min(voltages)
+    assert batt.cell_stats.num_cells == 128 * towers
+    assert batt.cell_stats.samples == 1
@@ -0,0 +1,105 @@
+"""Tests of the b-Box simulator."""
+
+import asyncio
+import struct
+
+import pytest
+
+import bydhvs
+from bydhvs import BYDHVS, REQUESTS
+from bydhvs.simulator import BYDSimulator, start_simulators
+
+
+@pytest.fixture(autouse=True)
+def _fast_measurements(monkeypatch):
+    """Probe the measurement status at once, the simulator has no delay."""
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_FIRST_PROBE", 0.0)
+    monkeypatch.setattr(bydhvs, "_MEASUREMENT_MIN_PROBE", 0.0)
+
+
+def test_identity_frames_decode():
+    """Packets 0 and 2 describe the configured topology."""
+    simulator = BYDSimulator("HVM", modules=3, towers=2, serial="P03T0123456789012")
+    batt = BYDHVS("127.0.0.1")
+    for request, parser in ((0, batt.parse_packet0), (2, batt.parse_packet2)):
+        response = simulator.handle_request(REQUESTS[request])
+        assert batt.check_packet(response)
+        parser(response)
+    assert batt.hvsSerial.startswith("P03T0123456789012")
+    assert batt.hvsModules == 3
+    assert batt.hvsTowers == 2
+    assert batt.hvsNumCells == simulator.num_cells == 48
+    assert batt.hvsNumTemps == simulator.num_temps == 24
+
+
+def test_exception_responses():
+    """Unknown registers and functions get Modbus exception frames."""
+    simulator = BYDSimulator()
+    read = bydhvs.build_frame(bytes((1, 3)) + struct.pack(">HH", 0x0200, 1))
+    assert simulator.handle_request(read)[:3] == bytes((1, 0x83, 2))
+    other = bydhvs.build_frame(bytes((1, 4)) + struct.pack(">HH", 0x0500, 1))
+    assert simulator.handle_request(other)[1] == 0x84
+    assert simulator.handle_request(b"\x01\x03") is None
+
+
+def test_measurement_is_busy_until_delay():
+    """The status register reports busy and blocks are empty meanwhile."""
+    simulator = BYDSimulator(measurement_delay=60.0)
+    simulator.handle_request(REQUESTS[3])  # Start measurement of tower 1
+    assert simulator.measurement_busy()
+    status = simulator.handle_request(REQUESTS[4])
+    assert struct.unpack_from(">H", status, 3)[0] & 0x8000
+    block = simulator.handle_request(REQUESTS[5])
+    assert not any(block[3:-2])
+    simulator.measurement_delay = 0.0
+    assert not simulator.measurement_busy()
+
+
+@pytest.mark.parametrize(
+    "battery_type, modules, cells, temps",
+    [("HVS", 5, 160, 60), ("HVM", 3, 48, 24)],
+)
+def test_poll_over_fragmented_tcp(battery_type, modules, cells, temps):
+    """A poll over responses split into small TCP segments decodes."""
+
+    async def run():
+        async with BYDSimulator(
+            battery_type, modules=modules, measurement_delay=0.0, fragment=7
+        ) as simulator:
+            batt = BYDHVS("127.0.0.1", simulator.port, adaptive_measurement=True)
+            return simulator, await batt.poll()
+
+    simulator, snapshot = asyncio.run(run())
+    assert not snapshot.stale
+    assert len(snapshot.cell_voltages) == cells
+    assert list(snapshot.cell_temperatures) == simulator.cell_temperatures[0][:temps]
+    assert snapshot.soc == simulator.summary["soc"]
+
+
+def test_corrupted_responses_are_rejected():
+    """With corrupt_rate 1 every response fails the CRC check."""
+
+    async def run():
+        async with BYDSimulator(corrupt_rate=1.0, seed=1) as simulator:
+            batt = BYDHVS("127.0.0.1", simulator.port, request_timeout=0.2)
+            return batt, await batt.poll_summary()
+
+    batt, snapshot = asyncio.run(run())
+    assert snapshot.stale
+    assert batt.hvsSerial == ""
+
+
+def test_start_simulators():
+    """Every simulator gets its own port."""
+
+    async def run():
+        simulators = await start_simulators(3, modules=2)
+        try:
+            return [simulator.port for simulator in simulators]
+        finally:
+            for simulator in simulators:
+                await simulator.stop()
+
+    ports = asyncio.run(run())
+    assert len(set(ports)) == 3
+    assert None not in ports
@@ -0,0 +1,79 @@
+"""Tests of the streaming API."""
+
+import asyncio
+
+import pytest
+
+from bydhvs import OVERFLOW_BLOCK, BYDHVS
+from bydhvs.simulator import BYDSimulator
+
+
+class FailingSimulator(BYDSimulator):
+    """Simulator failing some summary reads and raising the SOC afterwards."""
+
+    def __init__(self, *args, failed: range, drop: bool, **kwargs) -> None:
+        """Fail the summary reads whose number (from 1) is in failed."""
+        super().__init__(*args, **kwargs)
+        self.failed = failed
+        self.drop = drop
+        self.summary_reads = 0
+
+    def handle_request(self, request: bytes):
+        """Serve a request, dropping or corrupting the chosen summaries."""
+        response = super().handle_request(request)
+        if request[1:4] != b"\x03\x05\x00":
+            return response
+        self.summary_reads += 1
+        if self.summary_reads == self.failed.stop - 1:
+            self.summary["soc"] = 81  # Served from the next summary read on
+        if self.summary_reads not in self.failed:
+            return response
+        if self.drop:
+            return None
+        return response[:-1] + bytes((response[-1] ^ 0xFF,))
+
+
+@pytest.mark.parametrize("drop", [True, False], ids=["dropped", "corrupted"])
+def test_stream_skips_failed_polls(drop):
+    """A poll whose summary read fails yields nothing instead of old data.
+
+    All three attempts of the second poll fail. A dropped response times
+    out and the poll raises, a corrupted one makes the poll return stale
+    data. In both cases the next sample comes from the third poll.
+    """
+
+    async def run():
+        async with FailingSimulator(
+            measurement_delay=0.0, failed=range(2, 5), drop=drop
+        ) as simulator:
+            batt = BYDHVS("127.0.0.1", simulator.port, request_timeout=0.2)
+            samples = []
+            async for snapshot in batt.stream(
+                0.0, detail=False, overflow=OVERFLOW_BLOCK
+            ):
+                samples.append(snapshot)
+                if len(samples) == 2:
+                    break
+            stale = await batt.poll_summary()
+            return simulator, samples, stale
+
+    simulator, samples, _ = asyncio.run(run())
+    assert simulator.summary_reads >= 5
+    assert [sample.soc for sample in samples] == [80, 81]
+    assert not any(sample.stale for sample in samples)
+
+
+def test_failed_poll_returns_stale_snapshot():
+    """poll_summary() marks the snapshot of a failed read as stale."""
+
+    async def run():
+        async with FailingSimulator(
+            measurement_delay=0.0, failed=range(2, 5), drop=False
+        ) as simulator:
+            batt = BYDHVS("127.0.0.1", simulator.port)
+            return await batt.poll_summary(), await batt.poll_summary()
+
+    current, failed = asyncio.run(run())
+    assert not current.stale
+    assert failed.stale
+    assert failed.soc == 80